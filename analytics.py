@@ -0,0 +1,153 @@
+import json
+import math
+from collections import defaultdict
+from itertools import chain
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+from quizmaster.extensions import db
+from quizmaster.database import read_execute, upsert
+from quizmaster.archive import archive
+from quizmaster.models import Attempt, Question, Quiz, QuizStats, QuizScoreBucket
+
+LEADERBOARD_SIZE = 10
+PERCENTILES = (25, 50, 75, 90, 95, 99)
+REBUILD_BATCH_SIZE = 5000
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_command)
+
+
+def backfill():
+    # Databases that predate the analytics tables get them filled once
+    if db.session.execute(select(QuizStats.quiz_id).limit(1)).first() is None \
+            and db.session.execute(select(Attempt.id).limit(1)).first() is not None:
+        rebuild()
+
+
+def _upsert_bucket(quiz_id, score, count):
+    # Counts are added with ON CONFLICT so concurrent submitters never lose an increment
+    stmt = upsert(QuizScoreBucket).values(quiz_id=quiz_id, score=score, count=count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['quiz_id', 'score'],
+        set_={'count': QuizScoreBucket.count + stmt.excluded.count}
+    )
+    db.session.execute(stmt)
+
+
+def record_scores(entries, leaderboard_size=LEADERBOARD_SIZE):
+    # entries: iterable of (quiz_id, attempt_id, user_id, score, completed_at) for newly
+    # inserted attempts. Runs in the caller's transaction.
+    by_quiz = defaultdict(list)
+    for entry in entries:
+        by_quiz[entry[0]].append(entry)
+    for quiz_id, quiz_entries in by_quiz.items():
+        buckets = defaultdict(int)
+        for _, _, _, score, _ in quiz_entries:
+            buckets[score or 0] += 1
+        for score, count in buckets.items():
+            _upsert_bucket(quiz_id, score, count)
+
+        # The row is created with ON CONFLICT first, so there is always one for FOR UPDATE to lock
+        db.session.execute(upsert(QuizStats).values(
+            quiz_id=quiz_id, attempts=0, score_sum=0, score_sq_sum=0, leaderboard='[]'
+        ).on_conflict_do_nothing(index_elements=['quiz_id']))
+        stats = db.session.query(QuizStats).filter_by(quiz_id=quiz_id).with_for_update().one()
+        stats.attempts += len(quiz_entries)
+        stats.score_sum += sum(score or 0 for _, _, _, score, _ in quiz_entries)
+        stats.score_sq_sum += sum((score or 0) ** 2 for _, _, _, score, _ in quiz_entries)
+        leaderboard = json.loads(stats.leaderboard or '[]')
+        floor = leaderboard[-1]['score'] if len(leaderboard) >= leaderboard_size else None
+        contenders = [e for e in quiz_entries if floor is None or (e[3] or 0) > floor]
+        if contenders:
+            leaderboard.extend({
+                'attempt_id': attempt_id,
+                'user_id': user_id,
+                'score': score or 0,
+                'completed_at': (completed_at or datetime.utcnow()).isoformat()
+            } for _, attempt_id, user_id, score, completed_at in contenders)
+            # Ties go to whoever got there first
+            leaderboard.sort(key=lambda row: (-row['score'], row['completed_at'], row['attempt_id']))
+            stats.leaderboard = json.dumps(leaderboard[:leaderboard_size])
+        stats.updated_at = datetime.utcnow()
+
+
+def percentile_from_histogram(histogram, total, pct):
+    # Nearest-rank percentile over (score, count) pairs sorted by score
+    rank = max(1, math.ceil(pct / 100 * total))
+    seen = 0
+    for score, count in histogram:
+        seen += count
+        if seen >= rank:
+            return score
+    return None
+
+
+def quiz_summary(quiz):
+    stats = read_execute(select(QuizStats).where(QuizStats.quiz_id == quiz.id)).scalar()
+    max_score = read_execute(select(func.count(Question.id)).where(Question.quiz_id == quiz.id)).scalar()
+    if stats is None or not stats.attempts:
+        return {'quiz_id': quiz.id, 'title': quiz.title, 'max_score': max_score, 'attempts': 0,
+                'mean': None, 'stddev': None, 'percentiles': {}, 'histogram': [], 'leaderboard': []}
+    histogram = read_execute(
+        select(QuizScoreBucket.score, QuizScoreBucket.count)
+        .where(QuizScoreBucket.quiz_id == quiz.id)
+        .order_by(QuizScoreBucket.score)
+    ).all()
+    mean = stats.score_sum / stats.attempts
+    variance = max(stats.score_sq_sum / stats.attempts - mean ** 2, 0)
+    return {
+        'quiz_id': quiz.id,
+        'title': quiz.title,
+        'max_score': max_score,
+        'attempts': stats.attempts,
+        'mean': round(mean, 3),
+        'stddev': round(math.sqrt(variance), 3),
+        'percentiles': {f'p{pct}': percentile_from_histogram(histogram, stats.attempts, pct) for pct in PERCENTILES},
+        'histogram': [{'score': score, 'count': count} for score, count in histogram],
+        'leaderboard': json.loads(stats.leaderboard),
+        'updated_at': stats.updated_at.isoformat() if stats.updated_at else None
+    }
+
+
+def rebuild(quiz_id=None):
+    # Recompute from the attempts table and the archive, e.g. for databases that predate the
+    # analytics tables
+    for model in (QuizScoreBucket, QuizStats):
+        query = db.session.query(model)
+        if quiz_id is not None:
+            query = query.filter_by(quiz_id=quiz_id)
+        query.delete(synchronize_session=False)
+    query = db.session.query(Attempt.quiz_id, Attempt.id, Attempt.user_id, Attempt.score, Attempt.completed_at) \
+        .order_by(Attempt.id)
+    if quiz_id is not None:
+        query = query.filter(Attempt.quiz_id == quiz_id)
+    store = archive()
+    # Archived attempts of quizzes deleted since are left out
+    quiz_ids = db.session.execute(select(Quiz.id)).scalars().all() if quiz_id is None else [quiz_id]
+    archived = store.scores(quiz_ids) if store else ()
+    batch = []
+    total = 0
+    for row in chain(query.yield_per(REBUILD_BATCH_SIZE), archived):
+        batch.append(tuple(row))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            record_scores(batch)
+            db.session.flush()
+            total += len(batch)
+            batch = []
+    if batch:
+        record_scores(batch)
+        total += len(batch)
+    db.session.commit()
+    return total
+
+
+@click.command('analytics-rebuild')
+@click.option('--quiz-id', type=int, default=None)
+@with_appcontext
+def rebuild_command(quiz_id):
+    """Recompute per-quiz score statistics from the attempts table."""
+    total = rebuild(quiz_id)
+    click.echo(f'Rebuilt quiz analytics from {total} attempts.')
@@ -0,0 +1,189 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, delete, insert, select, update
+from quizmaster.extensions import db
+from quizmaster.models import Attempt, AttemptAnswer, Option, Question
+
+# An attempt's answers are stored either as one AttemptAnswer row per question ("rows") or
+# packed into Attempt.packed_answers ("packed"). Packed answers are a format byte followed by
+# two varints per question, in question id order: the gap from the previous question id, and
+# the selected option id as a zigzag offset from its question id plus one (zero means
+# unanswered). Options are created right after their question, so both usually fit in a byte.
+# Ids rather than positions are stored, so later edits to a quiz never reassign old answers.
+
+STORAGES = ('rows', 'packed')
+PACKED_FORMAT = 1
+CONVERT_BATCH_SIZE = 1000
+
+
+def storage():
+    return current_app.config.get('ANSWER_STORAGE', 'rows')
+
+
+def _write_varint(out, value):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def pack(answers):
+    # answers: iterable of (question_id, selected_option_id or None)
+    out = bytearray((PACKED_FORMAT,))
+    previous = 0
+    for question_id, option_id in sorted(answers):
+        _write_varint(out, question_id - previous)
+        if option_id is None:
+            out.append(0)
+        else:
+            offset = option_id - question_id
+            _write_varint(out, (offset << 1 ^ offset >> 63) + 1)
+        previous = question_id
+    return bytes(out)
+
+
+def unpack(blob):
+    if blob[0] != PACKED_FORMAT:
+        raise ValueError(f'Unknown packed answer format {blob[0]}')
+    answers = []
+    values = []
+    value = shift = 0
+    for byte in memoryview(blob)[1:]:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+    question_id = 0
+    for gap, option in zip(values[::2], values[1::2]):
+        question_id += gap
+        if option:
+            option -= 1
+            answers.append((question_id, question_id + (option >> 1 ^ -(option & 1))))
+        else:
+            answers.append((question_id, None))
+    return answers
+
+
+class _LiveIds:
+    # Packed answers aren't touched by ON DELETE CASCADE / SET NULL, so readers drop answers
+    # to deleted questions and null out deleted options, matching what rows would show
+    def __init__(self, execute):
+        self.execute = execute
+        self._quizzes = {}
+
+    def filter(self, quiz_id, answers):
+        live = self._quizzes.get(quiz_id)
+        if live is None:
+            questions, options = set(), set()
+            for question_id, option_id in self.execute(
+                select(Question.id, Option.id).outerjoin(Option, Option.question_id == Question.id)
+                .where(Question.quiz_id == quiz_id)
+            ):
+                questions.add(question_id)
+                options.add(option_id)
+            live = self._quizzes[quiz_id] = (questions, options)
+        questions, options = live
+        return [
+            (question_id, option_id if option_id in options else None)
+            for question_id, option_id in answers if question_id in questions
+        ]
+
+
+def unpacker(execute=None):
+    # Returns unpack_for(quiz_id, blob) for streaming readers such as the exporter; deleted
+    # questions and options are looked up once per quiz
+    live = _LiveIds(execute or db.session.execute)
+    return lambda quiz_id, blob: live.filter(quiz_id, unpack(blob))
+
+
+def load(attempts, execute=None):
+    # {attempt id: [(question_id, selected_option_id), ...]} ordered by question id, for
+    # attempts (objects or rows with id, quiz_id and packed_answers) in either storage
+    execute = execute or db.session.execute
+    unpack_for = unpacker(execute)
+    result = {}
+    row_ids = []
+    for attempt in attempts:
+        if attempt.packed_answers is not None:
+            result[attempt.id] = unpack_for(attempt.quiz_id, attempt.packed_answers)
+        else:
+            result[attempt.id] = []
+            row_ids.append(attempt.id)
+    if row_ids:
+        rows = execute(
+            select(AttemptAnswer.attempt_id, AttemptAnswer.question_id, AttemptAnswer.selected_option_id)
+            .where(AttemptAnswer.attempt_id.in_(row_ids))
+            .order_by(AttemptAnswer.attempt_id, AttemptAnswer.question_id)
+        )
+        for attempt_id, question_id, option_id in rows:
+            result[attempt_id].append((question_id, option_id))
+    return result
+
+
+def attempt_answers(attempt):
+    return load([attempt])[attempt.id]
+
+
+def insert_answers(attempt_ids, answer_lists):
+    # Row storage for freshly inserted attempts; packed attempts carry their answers already
+    rows = [
+        {'attempt_id': attempt_id, 'question_id': question_id, 'selected_option_id': option_id}
+        for attempt_id, answers in zip(attempt_ids, answer_lists)
+        for question_id, option_id in answers
+    ]
+    if rows:
+        db.session.execute(insert(AttemptAnswer), rows)
+
+
+def convert(target, batch_size=CONVERT_BATCH_SIZE):
+    # Moves existing attempts to the target storage in batches, one transaction each; returns
+    # the number of attempts converted. Safe to stop and rerun.
+    converted = 0
+    last_id = 0
+    while True:
+        query = select(Attempt.id, Attempt.quiz_id, Attempt.packed_answers) \
+            .where(Attempt.id > last_id) \
+            .order_by(Attempt.id) \
+            .limit(batch_size)
+        if target == 'packed':
+            query = query.where(Attempt.packed_answers.is_(None))
+        else:
+            query = query.where(Attempt.packed_answers.isnot(None))
+        batch = db.session.execute(query).all()
+        if not batch:
+            return converted
+        ids = [attempt_id for attempt_id, _, _ in batch]
+        if target == 'packed':
+            answers = load(batch)
+            db.session.connection().execute(
+                update(Attempt).where(Attempt.id == bindparam('attempt_id')).values(packed_answers=bindparam('packed')),
+                [{'attempt_id': attempt_id, 'packed': pack(answers[attempt_id])} for attempt_id in ids]
+            )
+            db.session.execute(delete(AttemptAnswer).where(AttemptAnswer.attempt_id.in_(ids)))
+        else:
+            unpack_for = unpacker()
+            insert_answers(ids, [unpack_for(quiz_id, blob) for _, quiz_id, blob in batch])
+            db.session.execute(update(Attempt).where(Attempt.id.in_(ids)).values(packed_answers=None))
+        db.session.commit()
+        converted += len(batch)
+        last_id = ids[-1]
+
+
+@click.command('answers-convert')
+@click.argument('target', type=click.Choice(STORAGES))
+@click.option('--batch-size', type=int, default=CONVERT_BATCH_SIZE)
+@with_appcontext
+def convert_command(target, batch_size):
+    """Rewrite stored attempt answers as AttemptAnswer rows or packed blobs."""
+    converted = convert(target, batch_size)
+    click.echo(f'Converted {converted} attempts to {target} answers.')
+
+
+def init_app(app):
+    app.config.setdefault('ANSWER_STORAGE', 'rows')
+    if app.config['ANSWER_STORAGE'] not in STORAGES:
+        raise ValueError(f"ANSWER_STORAGE must be one of {', '.join(STORAGES)}")
+    app.cli.add_command(convert_command)
@@ -1,34 +1,100 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
 from flask import Flask
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 import os
 from flask import render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
-from quizmaster.extensions import db
+from quizmaster.extensions import db, passwords, user_cache
+from quizmaster.passwords import PasswordServiceBusy
+from quizmaster import database
+from quizmaster.config import load_config
+from quizmaster.database import configure_engines
+from quizmaster.progress import ProgressStore
+from quizmaster.grading import AnswerKeyCache
+from quizmaster.catalog import CatalogCache
+from quizmaster.delivery import QuizPayloadCache
+from quizmaster.metrics import Metrics
+from quizmaster.deletion import DeletionService, job_status
+from quizmaster.journal import SubmissionQueue
+from quizmaster.archive import AttemptArchive
+from quizmaster import bootstrap
+from quizmaster.bootstrap import StartupTimer
+from quizmaster.httpcache import Validators, make_etag
 from quizmaster.forms import RegistrationForm, LoginForm, QuizForm, QuestionForm, OptionForm, SubjectForm, ChapterForm
+from quizmaster.models import User, Quiz, Attempt, Question, Option, Subject, Chapter, DeletionJob
+from quizmaster.history import user_attempt_history
+from quizmaster.submissions import record_attempt
+from quizmaster import search
+from quizmaster import stats as site_stats
+from quizmaster import analytics
+from quizmaster import mastery
+from quizmaster import migrations
+from quizmaster import importer
+from quizmaster import exporter
+from quizmaster import answers as stored_answers
 from datetime import datetime, timedelta
 from flask import session
 from flask import abort
+from flask import jsonify
+from flask import Response, stream_with_context
 
 login_manager = LoginManager()
 csrf = CSRFProtect()
-
-def create_app():
+progress_store = ProgressStore()
+answer_keys = AnswerKeyCache()
+catalog_cache = CatalogCache()
+quiz_payloads = QuizPayloadCache()
+metrics = Metrics()
+deletions = DeletionService()
+submission_queue = SubmissionQueue()
+attempt_archive = AttemptArchive()
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+def create_app(config=None):
+    timer = StartupTimer()
     app = Flask(__name__)
-    app.config['SECRET_KEY'] = 'your-secret-key'
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///quizmaster.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    load_config(app, config)
+    configure_engines(app)
 
     db.init_app(app)
+    database.init_app(app)
+    timer.lap('config')
+    passwords.init_app(app)
+    user_cache.init_app(app)
     login_manager.init_app(app)
     csrf.init_app(app)
-
-    # Import models here to avoid circular import
-    from quizmaster.models import User, Quiz, Attempt, Question, Option, AttemptAnswer, Subject, Chapter
+    progress_store.init_app(app)
+    answer_keys.init_app(app)
+    catalog_cache.init_app(app)
+    quiz_payloads.init_app(app)
+    metrics.init_app(app)
+    deletions.init_app(app)
+    submission_queue.init_app(app)
+    attempt_archive.init_app(app)
+    metrics.gauge('quizmaster_user_cache_hits_total', 'current_user lookups served from the user cache.',
+                  lambda: user_cache.stats()['hits'], kind='counter')
+    metrics.gauge('quizmaster_user_cache_misses_total', 'current_user lookups that loaded the user row.',
+                  lambda: user_cache.stats()['misses'], kind='counter')
+    metrics.gauge('quizmaster_user_cache_entries', 'Users currently held in the user cache.',
+                  lambda: user_cache.stats()['entries'])
+    metrics.gauge('quizmaster_startup_seconds', 'Time this process spent in create_app().',
+                  lambda: app.extensions['startup']['total'])
+    if submission_queue.enabled:
+        metrics.register(submission_queue)
+    timer.lap('extensions')
+
+    def flash_deletion(label, job):
+        if job.status == 'done':
+            flash(f'{label} deleted.', 'info')
+        else:
+            flash(f'{label} is being deleted in the background ({job.total} attempts); '
+                  f"progress: {url_for('deletion_progress', job_id=job.id)}", 'info')
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return user_cache.get(int(user_id), lambda uid: db.session.get(User, uid))
 
     # All route definitions go here, using 'app.route' and referencing models/forms as needed
     @app.route('/register', methods=['GET', 'POST'])
@@ -61,7 +127,16 @@ def create_app():
         form = LoginForm()
         if form.validate_on_submit():
             user = User.query.filter_by(email=form.email.data).first()
-            if user and user.check_password(form.password.data):
+            try:
+                valid = user is not None and user.check_password(form.password.data)
+                if valid and user.password_needs_rehash():
+                    # Upgrade hashes made with older algorithm or cost settings
+                    user.set_password(form.password.data)
+                    db.session.commit()
+            except PasswordServiceBusy:
+                flash('The server is busy, please try again in a moment.', 'warning')
+                return render_template('login.html', form=form), 503
+            if valid:
                 login_user(user, remember=form.remember.data)
                 flash('Logged in successfully.', 'success')
                 next_page = request.args.get('next')
@@ -80,81 +155,163 @@ def create_app():
     @app.route('/dashboard', methods=['GET', 'POST'])
     @login_required
     def dashboard():
-        subjects = Subject.query.all()
+        catalog = catalog_cache.get()
+        subjects = catalog.subjects
         selected_subject_id = request.form.get('subject')
         selected_chapter_id = request.form.get('chapter')
-        chapters = Chapter.query.filter_by(subject_id=selected_subject_id).all() if selected_subject_id else []
+        chapters = catalog.chapters(int(selected_subject_id)) if selected_subject_id and selected_subject_id.isdigit() else []
         quizzes = []
-        if selected_chapter_id:
-            quizzes = Quiz.query.filter_by(chapter_id=selected_chapter_id).all()
-        attempts = Attempt.query.filter_by(user_id=current_user.id).order_by(Attempt.completed_at.desc()).all()
-        attempts_data = []
-        for a in attempts:
-            max_score = len(a.quiz.questions)
-            percent = int((a.score or 0) / (max_score or 1) * 100)
-            attempts_data.append({
-                'quiz': a.quiz,
-                'score': a.score or 0,
-                'max_score': max_score or 1,
-                'percent': percent,
-                'duration': a.duration or 0,
-                'completed_at': a.completed_at or datetime.utcnow()
-            })
+        if selected_chapter_id and selected_chapter_id.isdigit():
+            quizzes = catalog.quizzes(int(selected_chapter_id))
+        attempts_data, next_cursor = user_attempt_history(current_user.id, cursor=request.args.get('before'))
         return render_template('dashboard.html',
             subjects=subjects,
             chapters=chapters,
             quizzes=quizzes,
             selected_subject_id=selected_subject_id,
             selected_chapter_id=selected_chapter_id,
-            attempts=attempts_data)
+            attempts=attempts_data,
+            next_cursor=next_cursor)
+
+    @app.route('/api/catalog')
+    @login_required
+    def catalog_json():
+        catalog = catalog_cache.get()
+        validators = Validators(make_etag('catalog', catalog.version), catalog.last_modified)
+        if validators.not_modified():
+            return validators.not_modified_response()
+        return validators.respond(jsonify(catalog.as_dict()))
+
+    @app.route('/api/quizzes/<int:quiz_id>')
+    @login_required
+    def quiz_payload(quiz_id):
+        quiz = Quiz.query.get_or_404(quiz_id)
+        validators = Validators(make_etag('quiz-payload', quiz.id, quiz.questions_version, quiz.updated_at), quiz.updated_at)
+        if validators.not_modified():
+            return validators.not_modified_response()
+        payload = quiz_payloads.get(quiz)
+        return validators.respond(Response(payload.body, mimetype='application/json'))
+
+    @app.route('/api/quizzes/<int:quiz_id>/submit', methods=['POST'])
+    @login_required
+    def submit_quiz(quiz_id):
+        quiz = Quiz.query.get_or_404(quiz_id)
+        data = request.get_json(silent=True) or {}
+        answers = data.get('answers')
+        if not isinstance(answers, dict):
+            return jsonify({'error': 'answers must be an object of question id to option id'}), 400
+        try:
+            answers = quiz_payloads.get(quiz).validate(answers)
+        except ValueError as exc:
+            return jsonify({'error': str(exc)}), 400
+        answer_key = answer_keys.get(quiz)
+        if not len(answer_key):
+            return jsonify({'error': 'No questions in this quiz.'}), 400
+        score, selected = answer_key.grade(answers)
+        answers = [(question_id, option_id or None) for question_id, option_id in zip(answer_key.question_ids, selected)]
+        result = {'score': score, 'max_score': len(answer_key), 'percent': int(score / len(answer_key) * 100)}
+        if submission_queue.enabled:
+            # Acknowledged once journaled; the attempt appears in history after the next flush
+            result['submission_key'] = submission_queue.enqueue(current_user.id, quiz.id, score, answers,
+                                                                duration=quiz.duration_seconds)
+        else:
+            result['attempt_id'] = record_attempt(current_user.id, quiz.id, score, answers,
+                                                  duration=quiz.duration_seconds).id
+        token = session.get('progress_token')
+        progress = progress_store.get(token)
+        if progress and progress['quiz_id'] == quiz_id:
+            progress_store.discard(token)
+            session.pop('progress_token', None)
+        return jsonify(result)
+
+    @app.route('/api/attempts/<int:attempt_id>')
+    @login_required
+    def attempt_review(attempt_id):
+        # Attempts moved to the archive are reviewed from there
+        attempt = db.session.get(Attempt, attempt_id) or attempt_archive.find(attempt_id)
+        if attempt is None:
+            abort(404)
+        if attempt.user_id != current_user.id and not current_user.is_admin:
+            abort(403)
+        answer_key = answer_keys.get(Quiz.query.get_or_404(attempt.quiz_id))
+        correct = dict(zip(answer_key.question_ids, answer_key.correct_option_ids))
+        return jsonify({
+            'attempt_id': attempt.id,
+            'quiz_id': attempt.quiz_id,
+            'score': attempt.score,
+            'completed_at': attempt.completed_at.isoformat() if attempt.completed_at else None,
+            'answers': [
+                {'question_id': question_id, 'selected_option_id': option_id,
+                 'correct': option_id is not None and correct.get(question_id) == option_id}
+                for question_id, option_id in stored_answers.attempt_answers(attempt)
+            ]
+        })
+
+    @app.route('/api/mastery')
+    @login_required
+    def my_mastery():
+        return jsonify(mastery.user_mastery(current_user.id, catalog_cache.get()))
 
     @app.route('/quiz/<int:quiz_id>', methods=['GET', 'POST'])
     @login_required
     def take_quiz(quiz_id):
         quiz = Quiz.query.get_or_404(quiz_id)
+        # Quiz progress lives in the progress store; the session only holds its token
+        token = session.get('progress_token')
+        progress = progress_store.get(token)
+        if not progress or progress['quiz_id'] != quiz_id or progress['user_id'] != current_user.id:
+            progress_store.discard(token)
+            token = progress_store.new_token()
+            session['progress_token'] = token
+            progress = {'user_id': current_user.id, 'quiz_id': quiz_id, 'current_index': 0, 'answers': {}}
+            progress_store.save(token, progress)
+        # The page is a function of the quiz content and this attempt's progress only, and
+        # progress changes without touching the quiz, so there is no Last-Modified here
+        validators = Validators(make_etag('quiz', quiz.id, quiz.questions_version, quiz.updated_at, token,
+                                          progress['current_index'], sorted(progress['answers'].items())))
+        if validators.not_modified():
+            return validators.not_modified_response()
         questions = quiz.questions
         if not questions:
             flash('No questions in this quiz.', 'warning')
             return redirect(url_for('dashboard'))
-        # Session state for quiz progress
-        if 'quiz_progress' not in session or session.get('quiz_id') != quiz_id:
-            session['quiz_progress'] = {}
-            session['quiz_id'] = quiz_id
-            session['current_index'] = 0
         if request.method == 'POST':
             selected_option = request.form.get('selected_option')
-            current_index = session['current_index']
+            current_index = progress['current_index']
             if selected_option:
-                session['quiz_progress'][str(questions[current_index].id)] = int(selected_option)
+                question_id = questions[current_index].id
+                try:
+                    # Only options of this question; anything else would fail the foreign key on insert
+                    selected = quiz_payloads.get(quiz).validate({question_id: selected_option})
+                except ValueError:
+                    abort(400)
+                progress['answers'][str(question_id)] = selected[question_id]
             action = request.form.get('action')
             if action == 'next' and current_index < len(questions) - 1:
-                session['current_index'] += 1
+                progress['current_index'] += 1
             elif action == 'prev' and current_index > 0:
-                session['current_index'] -= 1
+                progress['current_index'] -= 1
             elif action == 'submit':
-                # Calculate score
-                score = 0
-                answers = []
-                for q in questions:
-                    selected = session['quiz_progress'].get(str(q.id))
-                    if selected and q.correct_option_id == selected:
-                        score += 1
-                    answers.append({'question_id': q.id, 'selected_option_id': selected})
-                attempt = Attempt(user_id=current_user.id, quiz_id=quiz.id, score=score, completed_at=datetime.utcnow(), duration=quiz.duration*60)
-                db.session.add(attempt)
-                db.session.commit()
-                for ans in answers:
-                    db.session.add(AttemptAnswer(attempt_id=attempt.id, question_id=ans['question_id'], selected_option_id=ans['selected_option_id']))
-                db.session.commit()
-                session.pop('quiz_progress', None)
-                session.pop('quiz_id', None)
-                session.pop('current_index', None)
-                flash(f'Quiz submitted! Your score: {score}/{len(questions)}', 'success')
+                # Calculate score against the cached answer key
+                answer_key = answer_keys.get(quiz)
+                score, selected = answer_key.grade(progress['answers'])
+                answers = [(question_id, option_id or None) for question_id, option_id in zip(answer_key.question_ids, selected)]
+                if submission_queue.enabled:
+                    submission_queue.enqueue(current_user.id, quiz.id, score, answers, duration=quiz.duration_seconds)
+                else:
+                    record_attempt(current_user.id, quiz.id, score, answers, duration=quiz.duration_seconds)
+                progress_store.discard(token)
+                session.pop('progress_token', None)
+                flash(f'Quiz submitted! Your score: {score}/{len(answer_key)}', 'success')
                 return redirect(url_for('dashboard'))
-        current_index = session.get('current_index', 0)
+            progress_store.save(token, progress)
+        current_index = progress['current_index']
         question = questions[current_index]
-        selected_option = session['quiz_progress'].get(str(question.id)) if 'quiz_progress' in session else None
-        return render_template('quiz.html', quiz=quiz, questions=questions, current_index=current_index, question=question, selected_option=selected_option)
+        selected_option = progress['answers'].get(str(question.id))
+        page = render_template('quiz.html', quiz=quiz, questions=questions, current_index=current_index, question=question, selected_option=selected_option)
+        if request.method == 'POST':
+            return page
+        return validators.respond(page)
 
     @app.route('/admin/quizzes')
     @login_required
@@ -208,19 +365,36 @@ def create_app():
         if not current_user.is_admin:
             abort(403)
         quiz = Quiz.query.get_or_404(quiz_id)
-        db.session.delete(quiz)
-        db.session.commit()
-        flash('Quiz deleted.', 'info')
+        flash_deletion('Quiz', deletions.submit('quiz', quiz.id))
         return redirect(url_for('admin_quizzes'))
 
+    @app.route('/admin/quizzes/<int:quiz_id>/stats')
+    @login_required
+    def quiz_stats(quiz_id):
+        if not current_user.is_admin:
+            abort(403)
+        quiz = Quiz.query.get_or_404(quiz_id)
+        return jsonify(analytics.quiz_summary(quiz))
+
+    @app.route('/admin/users/<int:user_id>/mastery')
+    @login_required
+    def user_mastery(user_id):
+        if not current_user.is_admin:
+            abort(403)
+        user = User.query.get_or_404(user_id)
+        return jsonify(mastery.user_mastery(user.id, catalog_cache.get()))
+
     @app.route('/admin/quizzes/<int:quiz_id>/questions')
     @login_required
     def manage_questions(quiz_id):
         if not current_user.is_admin:
             abort(403)
         quiz = Quiz.query.get_or_404(quiz_id)
+        validators = Validators(make_etag('questions', quiz.id, quiz.questions_version, quiz.updated_at), quiz.updated_at)
+        if validators.not_modified():
+            return validators.not_modified_response()
         questions = quiz.questions
-        return render_template('admin/manage_questions.html', quiz=quiz, questions=questions)
+        return validators.respond(render_template('admin/manage_questions.html', quiz=quiz, questions=questions))
 
     @app.route('/admin/quizzes/<int:quiz_id>/questions/add', methods=['GET', 'POST'])
     @login_required
@@ -244,6 +418,7 @@ def create_app():
             correct_index = form.correct_option.data
             if 0 <= correct_index < len(options):
                 question.correct_option_id = options[correct_index].id
+            quiz.questions_version = Quiz.questions_version + 1
             db.session.commit()
             flash('Question added successfully.', 'success')
             return redirect(url_for('manage_questions', quiz_id=quiz.id))
@@ -276,6 +451,7 @@ def create_app():
             correct_index = form.correct_option.data
             if 0 <= correct_index < len(options):
                 question.correct_option_id = options[correct_index].id
+            quiz.questions_version = Quiz.questions_version + 1
             db.session.commit()
             flash('Question updated successfully.', 'success')
             return redirect(url_for('manage_questions', quiz_id=quiz.id))
@@ -287,6 +463,7 @@ def create_app():
         if not current_user.is_admin:
             abort(403)
         question = Question.query.get_or_404(question_id)
+        question.quiz.questions_version = Quiz.questions_version + 1
         db.session.delete(question)
         db.session.commit()
         flash('Question deleted.', 'info')
@@ -335,9 +512,7 @@ def create_app():
         if not current_user.is_admin:
             abort(403)
         subject = Subject.query.get_or_404(subject_id)
-        db.session.delete(subject)
-        db.session.commit()
-        flash('Subject deleted.', 'info')
+        flash_deletion('Subject', deletions.submit('subject', subject.id))
         return redirect(url_for('manage_subjects'))
 
     @app.route('/admin/subjects/<int:subject_id>/chapters')
@@ -386,9 +561,7 @@ def create_app():
         if not current_user.is_admin:
             abort(403)
         chapter = Chapter.query.get_or_404(chapter_id)
-        db.session.delete(chapter)
-        db.session.commit()
-        flash('Chapter deleted.', 'info')
+        flash_deletion('Chapter', deletions.submit('chapter', chapter.id))
         return redirect(url_for('manage_chapters', subject_id=subject_id))
 
     @app.route('/admin/chapters/<int:chapter_id>/quizzes')
@@ -451,50 +624,92 @@ def create_app():
         if not current_user.is_admin:
             abort(403)
         quiz = Quiz.query.get_or_404(quiz_id)
-        db.session.delete(quiz)
-        db.session.commit()
-        flash('Quiz deleted.', 'info')
+        flash_deletion('Quiz', deletions.submit('quiz', quiz.id))
         return redirect(url_for('manage_quizzes', chapter_id=chapter_id))
 
+    @app.route('/admin/deletions/<int:job_id>')
+    @login_required
+    def deletion_progress(job_id):
+        if not current_user.is_admin:
+            abort(403)
+        return jsonify(job_status(DeletionJob.query.get_or_404(job_id)))
+
+    @app.route('/admin/import', methods=['POST'])
+    @login_required
+    def import_questions():
+        # Multipart upload ("file", optional "format") answered with a JSON report; no form page
+        if not current_user.is_admin:
+            abort(403)
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return jsonify({'error': 'No file uploaded.'}), 400
+        fmt = request.form.get('format') or None
+        if fmt and fmt not in importer.FORMATS:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+        report = importer.import_upload(upload, fmt)
+        return jsonify(report.as_dict())
+
+    @app.route('/admin/export/attempts')
+    @login_required
+    def export_attempts():
+        if not current_user.is_admin:
+            abort(403)
+        fmt = request.args.get('format', 'csv')
+        if fmt not in exporter.FORMATS:
+            abort(400)
+        try:
+            filters = exporter.parse_filters(request.args)
+        except ValueError:
+            abort(400)
+        include_answers = request.args.get('answers', '1') != '0'
+        chunks = exporter.export_attempts(fmt, filters, include_answers=include_answers)
+        filename = f"attempts-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{fmt}"
+        return Response(stream_with_context(chunks), mimetype=exporter.MIMETYPES[fmt],
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+    @app.route('/metrics')
+    @login_required
+    def metrics_endpoint():
+        if not metrics.enabled:
+            abort(404)
+        if not current_user.is_admin:
+            abort(403)
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
     @app.route('/admin/dashboard', methods=['GET', 'POST'])
     @login_required
     def admin_dashboard():
         if not current_user.is_admin:
             abort(403)
-        stats = {
-            'users': User.query.filter_by(is_admin=False).count(),
-            'subjects': Subject.query.count(),
-            'chapters': Chapter.query.count(),
-            'quizzes': Quiz.query.count(),
-            'attempts': Attempt.query.count()
-        }
-        search_type = request.form.get('search_type')
-        search_query = request.form.get('search_query', '').strip()
+        stats = site_stats.read()
+        search_type = request.values.get('search_type')
+        search_query = request.values.get('search_query', '').strip()
+        page = request.values.get('page', 1, type=int)
         results = []
-        if search_type and search_query:
-            if search_type == 'user':
-                results = User.query.filter(User.email.ilike(f'%{search_query}%')).all()
-            elif search_type == 'subject':
-                results = Subject.query.filter(Subject.name.ilike(f'%{search_query}%')).all()
-            elif search_type == 'quiz':
-                results = Quiz.query.filter(Quiz.title.ilike(f'%{search_query}%')).all()
-        return render_template('admin/admin_dashboard.html', stats=stats, search_type=search_type, search_query=search_query, results=results)
+        has_next = False
+        if search_type in search.INDEXED_KINDS and search_query:
+            results, has_next = search.search(search_type, search_query, page=page)
+        return render_template('admin/admin_dashboard.html', stats=stats, search_type=search_type, search_query=search_query, results=results, page=page, has_next=has_next)
 
+    timer.lap('routes')
     with app.app_context():
-        db.create_all()
-        # Seed admin account if not exists
-        admin = User.query.filter_by(is_admin=True).first()
-        if not admin:
-            admin = User(
-                email='admin@quiz.com',
-                full_name='Quiz Master Admin',
-                qualification='Administrator',
-                dob=None,
-                is_admin=True
-            )
-            admin.set_password('admin123')
-            db.session.add(admin)
-            db.session.commit()
+        migrations.init_app(app)
+        importer.init_app(app)
+        exporter.init_app(app)
+        stored_answers.init_app(app)
+        search.init_app(app)
+        site_stats.init_app(app)
+        analytics.init_app(app)
+        mastery.init_app(app)
+        bootstrap.init_app(app)
+        timer.lap('commands')
+        # With FAST_STARTUP the schema and admin account come from `flask init-db` and `flask seed`
+        if not app.config['FAST_STARTUP']:
+            bootstrap.init_db()
+            timer.lap('database')
+            bootstrap.seed_admin()
+            timer.lap('seed')
+    timer.finish(app, IMPORT_SECONDS)
 
     return app 
 
@@ -0,0 +1,258 @@
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, select, text
+from quizmaster.extensions import db
+from quizmaster.models import Attempt
+from quizmaster import answers as stored_answers
+
+# Attempts older than ARCHIVE_AFTER_DAYS move out of the live tables into a separate SQLite
+# file. Each archived attempt keeps a small metadata row (enough for history pages, counts and
+# rebuilding the score aggregates); its answers go, packed, into zlib-compressed chunks of one
+# user's attempts, and are only decompressed when a single archived attempt is reviewed.
+# Quiz statistics, mastery rollups and the site attempt count keep including archived attempts.
+
+ARCHIVE_BATCH_SIZE = 1000
+_ENTRY = struct.Struct('<qI')  # attempt id, packed answers length
+
+ArchivedAttempt = namedtuple('ArchivedAttempt', 'id user_id quiz_id score completed_at duration packed_answers')
+
+
+def _timestamp(value):
+    return value.isoformat() if value else None
+
+
+def _datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+class AttemptArchive:
+    def __init__(self):
+        self.path = None
+        self._local = threading.local()
+
+    def init_app(self, app):
+        self.path = app.config.setdefault('ARCHIVE_PATH', os.path.join(app.instance_path, 'attempt_archive.db'))
+        # Connections opened for an earlier app may point at another file
+        self._local = threading.local()
+        app.config.setdefault('ARCHIVE_AFTER_DAYS', 365)
+        app.config.setdefault('ARCHIVE_BATCH_SIZE', ARCHIVE_BATCH_SIZE)
+        app.extensions['attempt_archive'] = self
+        app.cli.add_command(archive_command)
+
+    def _connect(self, create=False):
+        # Readers never create the file: with nothing archived yet every lookup is free
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        if not create and not os.path.exists(self.path):
+            return None
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # Attempts are deleted from the live tables once written here, so writes are synced
+        conn.execute('PRAGMA synchronous=FULL')
+        conn.executescript(
+            'CREATE TABLE IF NOT EXISTS archive_chunk ('
+            ' id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, data BLOB NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS archived_attempt ('
+            ' attempt_id INTEGER PRIMARY KEY, chunk_id INTEGER NOT NULL, user_id INTEGER NOT NULL,'
+            ' quiz_id INTEGER NOT NULL, score INTEGER, completed_at TEXT, duration INTEGER);'
+            'CREATE INDEX IF NOT EXISTS ix_archived_attempt_history'
+            ' ON archived_attempt (user_id, completed_at, attempt_id);'
+            'CREATE INDEX IF NOT EXISTS ix_archived_attempt_quiz_id ON archived_attempt (quiz_id);'
+        )
+        self._local.conn = conn
+        return conn
+
+    def write(self, attempts):
+        # attempts: ArchivedAttempt tuples with packed answers; one chunk per user, one transaction
+        by_user = defaultdict(list)
+        for attempt in attempts:
+            by_user[attempt.user_id].append(attempt)
+        conn = self._connect(create=True)
+        conn.execute('BEGIN')
+        try:
+            for user_id, user_attempts in by_user.items():
+                data = bytearray()
+                for attempt in user_attempts:
+                    data += _ENTRY.pack(attempt.id, len(attempt.packed_answers))
+                    data += attempt.packed_answers
+                chunk_id = conn.execute('INSERT INTO archive_chunk (user_id, data) VALUES (?, ?)',
+                                        (user_id, zlib.compress(bytes(data), 9))).lastrowid
+                conn.executemany(
+                    'INSERT INTO archived_attempt (attempt_id, chunk_id, user_id, quiz_id, score, completed_at, duration)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(attempt.id, chunk_id, attempt.user_id, attempt.quiz_id, attempt.score,
+                      _timestamp(attempt.completed_at), attempt.duration) for attempt in user_attempts]
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def archived_ids(self, attempt_ids):
+        # {attempt id: (user id, completed_at)} for those of attempt_ids already archived
+        conn = self._connect()
+        if conn is None or not attempt_ids:
+            return {}
+        placeholders = ','.join('?' * len(attempt_ids))
+        return {attempt_id: (user_id, completed_at) for attempt_id, user_id, completed_at in conn.execute(
+            f'SELECT attempt_id, user_id, completed_at FROM archived_attempt WHERE attempt_id IN ({placeholders})',
+            list(attempt_ids))}
+
+    def max_id(self):
+        conn = self._connect()
+        return (conn.execute('SELECT max(attempt_id) FROM archived_attempt').fetchone()[0] or 0) if conn else 0
+
+    def count(self, quiz_ids=None):
+        conn = self._connect()
+        if conn is None:
+            return 0
+        if quiz_ids is None:
+            return conn.execute('SELECT count(*) FROM archived_attempt').fetchone()[0]
+        quiz_ids = list(quiz_ids)
+        if not quiz_ids:
+            return 0
+        return conn.execute(f"SELECT count(*) FROM archived_attempt WHERE quiz_id IN ({','.join('?' * len(quiz_ids))})",
+                            quiz_ids).fetchone()[0]
+
+    def scores(self, quiz_ids=None, user_ids=None):
+        # (quiz_id, attempt_id, user_id, score, completed_at) for rebuilding aggregates
+        conn = self._connect()
+        if conn is None:
+            return
+        conditions, params = [], []
+        for column, ids in (('quiz_id', quiz_ids), ('user_id', user_ids)):
+            if ids is None:
+                continue
+            ids = list(ids)
+            if not ids:
+                return
+            conditions.append(f"{column} IN ({','.join('?' * len(ids))})")
+            params += ids
+        query = 'SELECT quiz_id, attempt_id, user_id, score, completed_at FROM archived_attempt'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        for quiz_id, attempt_id, user_id, score, completed_at in conn.execute(query + ' ORDER BY attempt_id', params):
+            yield quiz_id, attempt_id, user_id, score, _datetime(completed_at)
+
+    def history(self, user_id, position=None, limit=20):
+        # Newest first from before position (completed_at, attempt id); metadata only,
+        # so no chunk is decompressed for a history page
+        conn = self._connect()
+        if conn is None:
+            return []
+        query = 'SELECT attempt_id, quiz_id, score, completed_at, duration FROM archived_attempt WHERE user_id = ?'
+        params = [user_id]
+        if position:
+            query += ' AND (completed_at, attempt_id) < (?, ?)'
+            params += [_timestamp(position[0]), position[1]]
+        query += ' ORDER BY completed_at DESC, attempt_id DESC LIMIT ?'
+        return [
+            ArchivedAttempt(attempt_id, user_id, quiz_id, score, _datetime(completed_at), duration, None)
+            for attempt_id, quiz_id, score, completed_at, duration in conn.execute(query, params + [limit])
+        ]
+
+    def find(self, attempt_id):
+        conn = self._connect()
+        if conn is None:
+            return None
+        row = conn.execute(
+            'SELECT a.user_id, a.quiz_id, a.score, a.completed_at, a.duration, c.data'
+            ' FROM archived_attempt a JOIN archive_chunk c ON c.id = a.chunk_id WHERE a.attempt_id = ?',
+            (attempt_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        user_id, quiz_id, score, completed_at, duration, data = row
+        data = zlib.decompress(data)
+        offset = 0
+        while offset < len(data):
+            entry_id, length = _ENTRY.unpack_from(data, offset)
+            offset += _ENTRY.size
+            if entry_id == attempt_id:
+                return ArchivedAttempt(attempt_id, user_id, quiz_id, score, _datetime(completed_at), duration,
+                                       bytes(data[offset:offset + length]))
+            offset += length
+        return None
+
+    def forget(self, quiz_ids):
+        # Drops archived attempts of deleted quizzes, and chunks left with none
+        conn = self._connect()
+        quiz_ids = list(quiz_ids)
+        if conn is None or not quiz_ids:
+            return
+        conn.execute('BEGIN')
+        conn.execute(f"DELETE FROM archived_attempt WHERE quiz_id IN ({','.join('?' * len(quiz_ids))})", quiz_ids)
+        conn.execute('DELETE FROM archive_chunk WHERE id NOT IN (SELECT chunk_id FROM archived_attempt)')
+        conn.execute('COMMIT')
+
+
+def archive():
+    # The app's archive, or None for apps (benchmarks, scripts) that never set one up
+    return current_app.extensions.get('attempt_archive')
+
+
+def archive_attempts(cutoff, batch_size=ARCHIVE_BATCH_SIZE, progress=None):
+    # Moves attempts completed before cutoff into the archive, oldest ids first, one batch per
+    # transaction; returns the number moved. Each batch is committed to the archive before it
+    # is deleted here, and a rerun after a crash in between deletes without archiving twice.
+    # An archived id that now belongs to a different attempt stops the run instead.
+    store = archive()
+    moved = 0
+    while True:
+        batch = db.session.execute(
+            select(Attempt.id, Attempt.user_id, Attempt.quiz_id, Attempt.score, Attempt.completed_at,
+                   Attempt.duration, Attempt.packed_answers)
+            .where(Attempt.completed_at < cutoff)
+            .order_by(Attempt.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            return moved
+        ids = [row.id for row in batch]
+        answers = stored_answers.load(batch)
+        done = store.archived_ids(ids)
+        for row in batch:
+            if row.id in done and done[row.id] != (row.user_id, _timestamp(row.completed_at)):
+                raise RuntimeError(f'Attempt {row.id} is already archived as a different attempt; '
+                                   'run `flask db-upgrade` so attempt ids are not reused')
+        store.write([
+            ArchivedAttempt(row.id, row.user_id, row.quiz_id, row.score, row.completed_at, row.duration,
+                            stored_answers.pack(answers[row.id]))
+            for row in batch if row.id not in done
+        ])
+        # The site attempt count includes archived attempts, so it stays as it is
+        db.session.execute(delete(Attempt).where(Attempt.id.in_(ids)), execution_options={'synchronize_session': False})
+        db.session.commit()
+        moved += len(ids)
+        if progress:
+            progress(moved)
+
+
+@click.command('archive-attempts')
+@click.option('--days', type=int, default=None, help='Archive attempts older than this; defaults to ARCHIVE_AFTER_DAYS.')
+@click.option('--batch-size', type=int, default=None)
+@click.option('--vacuum', is_flag=True, help='VACUUM the live SQLite database afterwards to return the space.')
+@with_appcontext
+def archive_command(days, batch_size, vacuum):
+    """Move old attempts and their answers into the compressed attempt archive."""
+    days = days if days is not None else current_app.config['ARCHIVE_AFTER_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    moved = archive_attempts(cutoff, batch_size or current_app.config['ARCHIVE_BATCH_SIZE'],
+                             progress=lambda moved: click.echo(f'{moved} attempts archived'))
+    if vacuum and db.engine.dialect.name == 'sqlite':
+        db.session.remove()
+        with db.engine.connect() as connection:
+            connection.execute(text('VACUUM'))
+            # In WAL mode the rewritten database sits in the WAL until it is checkpointed
+            connection.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+    click.echo(f'Archived {moved} attempts completed before {cutoff:%Y-%m-%d}.')
@@ -0,0 +1,88 @@
+import argparse
+import os
+import tempfile
+import time
+from flask import Flask
+from sqlalchemy import text
+from quizmaster.extensions import db
+from quizmaster.models import Attempt
+from quizmaster.answers import attempt_answers
+from quizmaster.submissions import record_attempt, import_attempts
+from quizmaster.benchmarks.bench_submit import seed
+
+# Database size and submit/review latency for row vs packed answer storage:
+#   python -m quizmaster.benchmarks.bench_answers --questions 50 --attempts 20000
+
+
+def make_app(path, storage):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['ANSWER_STORAGE'] = storage
+    db.init_app(app)
+    return app
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(storage, n_questions, n_attempts, n_timed):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        app = make_app(path, storage)
+        with app.app_context():
+            db.create_all()
+            user_id, quiz_id, answers = seed(n_questions)
+            # Bulk-load the bulk of the table, then time individual submissions on top of it
+            import_attempts({'user_id': user_id, 'quiz_id': quiz_id, 'score': len(answers), 'answers': answers}
+                            for _ in range(n_attempts - n_timed))
+            submit = []
+            for _ in range(n_timed):
+                start = time.perf_counter()
+                record_attempt(user_id, quiz_id, len(answers), answers, duration=0)
+                submit.append(time.perf_counter() - start)
+            ids = db.session.execute(text('SELECT id FROM attempt ORDER BY random() LIMIT :n'), {'n': n_timed}).scalars().all()
+            review = []
+            for attempt_id in ids:
+                db.session.expunge_all()
+                start = time.perf_counter()
+                attempt_answers(db.session.get(Attempt, attempt_id))
+                review.append(time.perf_counter() - start)
+            db.session.remove()
+            with db.engine.connect() as connection:
+                connection.execute(text('VACUUM'))
+                tables = dict(connection.execute(text(
+                    "SELECT name, sum(pgsize) FROM dbstat WHERE name IN ('attempt', 'attempt_answer', "
+                    "'ix_attempt_answer_attempt_id') GROUP BY name"
+                )).all()) if _has_dbstat(connection) else {}
+        size = os.path.getsize(path)
+    ms = lambda seconds: seconds * 1000
+    print(f'{storage:<7} db {size / 2**20:8.1f} MiB  {size / n_attempts:7.0f} B/attempt  '
+          f'submit p50 {ms(percentile(submit, 50)):6.2f} ms p95 {ms(percentile(submit, 95)):6.2f} ms  '
+          f'review p50 {ms(percentile(review, 50)):6.2f} ms')
+    for name, pages in sorted(tables.items()):
+        print(f'        {name:<30} {pages / 2**20:8.1f} MiB')
+
+
+def _has_dbstat(connection):
+    try:
+        connection.execute(text('SELECT 1 FROM dbstat LIMIT 1'))
+        return True
+    except Exception:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--attempts', type=int, default=20000)
+    parser.add_argument('--timed', type=int, default=500, help='Submissions and reviews timed individually.')
+    args = parser.parse_args()
+    for storage in ('rows', 'packed'):
+        run(storage, args.questions, args.attempts, args.timed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from quizmaster.app import create_app
+from quizmaster.extensions import db
+from quizmaster.models import User
+
+# Login throughput at different hash costs, through the real /login route:
+#   python -m quizmaster.benchmarks.bench_login --logins 200 --concurrency 16
+
+METHODS = ['pbkdf2:sha256:100000', 'pbkdf2:sha256:600000', 'scrypt:16384:8:1', 'scrypt:32768:8:1']
+
+
+def run(method, workers, n_logins, concurrency):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            'QUIZ_PROGRESS_PATH': os.path.join(tmp, 'progress.db'),
+            'PASSWORD_HASH_METHOD': method,
+            'PASSWORD_HASH_WORKERS': workers,
+            'WTF_CSRF_ENABLED': False,
+        })
+        with app.app_context():
+            for i in range(concurrency):
+                user = User(email=f'student{i}@quiz.com', full_name='Student', is_admin=False)
+                user.set_password('password')
+                db.session.add(user)
+            db.session.commit()
+
+        def login(i):
+            client = app.test_client()
+            response = client.post('/login', data={'email': f'student{i % concurrency}@quiz.com', 'password': 'password'})
+            return response.status_code == 302
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            ok = sum(pool.map(login, range(n_logins)))
+        elapsed = time.perf_counter() - start
+    print(f'{method:<24} workers={workers:<3} {ok / elapsed:8.1f} logins/s  ({ok}/{n_logins} ok, {elapsed:.2f}s)')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--method', action='append', help='Hash method(s) to compare; defaults to a standard set.')
+    args = parser.parse_args()
+    for method in args.method or METHODS:
+        run(method, args.workers, args.logins, args.concurrency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Cold start of N workers booting at once against one SQLite database, with and without
+# FAST_STARTUP, each in a fresh interpreter as a gunicorn worker would be:
+#   python -m quizmaster.benchmarks.bench_startup --workers 8
+
+WORKER = '''
+import json, time
+started = time.perf_counter()
+from quizmaster.app import create_app
+imported = time.perf_counter()
+app = create_app()
+print(json.dumps({'imports': imported - started, 'create_app': time.perf_counter() - imported,
+                  'phases': app.extensions['startup']['phases']}))
+'''
+
+
+def boot(env, workers):
+    processes = [subprocess.Popen([sys.executable, '-c', WORKER], env=env, stdout=subprocess.PIPE, text=True)
+                 for _ in range(workers)]
+    return [json.loads(process.communicate()[0].strip().splitlines()[-1]) for process in processes]
+
+
+def report(label, results):
+    ms = lambda seconds: seconds * 1000
+    create = sorted(result['create_app'] for result in results)
+    imports = sorted(result['imports'] for result in results)
+    print(f'{label:<8} create_app p50 {ms(create[len(create) // 2]):7.1f} ms max {ms(create[-1]):7.1f} ms  '
+          f'imports p50 {ms(imports[len(imports) // 2]):7.1f} ms')
+    phases = {}
+    for result in results:
+        for name, seconds in result['phases'].items():
+            phases.setdefault(name, []).append(seconds)
+    print('         ' + ', '.join(f'{name} {ms(max(values)):.1f}' for name, values in phases.items()) + ' (max ms)')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, QUIZMASTER_SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                   QUIZMASTER_QUIZ_PROGRESS_PATH=json.dumps(os.path.join(tmp, 'progress.db')))
+        # The first boot creates the schema and the admin account; later ones find them in place
+        boot(env, 1)
+        for label, fast in (('full', 'false'), ('fast', 'true')):
+            results = []
+            for _ in range(args.rounds):
+                results += boot(dict(env, QUIZMASTER_FAST_STARTUP=fast), args.workers)
+            report(label, results)
+
+
+if __name__ == '__main__':
+    main()
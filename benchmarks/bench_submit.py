@@ -0,0 +1,89 @@
+import argparse
+import os
+import tempfile
+import time
+from flask import Flask
+from quizmaster.extensions import db
+from quizmaster.models import User, Subject, Chapter, Quiz, Question, Option, Attempt, AttemptAnswer
+from quizmaster.submissions import record_attempt, import_attempts
+
+# Submissions per second on a file-backed SQLite database:
+#   python -m quizmaster.benchmarks.bench_submit --questions 50 --submissions 500
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(n_questions):
+    user = User(email='bench@quiz.com', full_name='Bench', password_hash='x')
+    subject = Subject(name='Bench')
+    db.session.add_all([user, subject])
+    db.session.flush()
+    chapter = Chapter(subject_id=subject.id, name='Bench')
+    db.session.add(chapter)
+    db.session.flush()
+    quiz = Quiz(chapter_id=chapter.id, title='Bench')
+    db.session.add(quiz)
+    db.session.flush()
+    answers = []
+    for i in range(n_questions):
+        question = Question(quiz_id=quiz.id, text=f'Q{i}')
+        db.session.add(question)
+        db.session.flush()
+        option = Option(question_id=question.id, text='A')
+        db.session.add(option)
+        db.session.flush()
+        answers.append((question.id, option.id))
+    db.session.commit()
+    return user.id, quiz.id, answers
+
+
+def legacy_submit(user_id, quiz_id, answers):
+    # The take_quiz() submit path before the submission service
+    attempt = Attempt(user_id=user_id, quiz_id=quiz_id, score=len(answers), duration=0)
+    db.session.add(attempt)
+    db.session.commit()
+    for question_id, option_id in answers:
+        db.session.add(AttemptAnswer(attempt_id=attempt.id, question_id=question_id, selected_option_id=option_id))
+    db.session.commit()
+
+
+def service_submit(user_id, quiz_id, answers):
+    record_attempt(user_id, quiz_id, len(answers), answers, duration=0)
+
+
+def run(name, submit, n_questions, n_submissions):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            user_id, quiz_id, answers = seed(n_questions)
+            start = time.perf_counter()
+            if submit is None:
+                import_attempts({'user_id': user_id, 'quiz_id': quiz_id, 'score': len(answers), 'answers': answers}
+                                for _ in range(n_submissions))
+            else:
+                for _ in range(n_submissions):
+                    submit(user_id, quiz_id, answers)
+            elapsed = time.perf_counter() - start
+            db.session.remove()
+    print(f'{name:<16} {n_submissions / elapsed:10.1f} submissions/s  ({elapsed:.2f}s)')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--submissions', type=int, default=500)
+    args = parser.parse_args()
+    run('legacy', legacy_submit, args.questions, args.submissions)
+    run('record_attempt', service_submit, args.questions, args.submissions)
+    run('import_attempts', None, args.questions, args.submissions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from jinja2 import FunctionLoader, TemplateNotFound
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from quizmaster.app import create_app
+from quizmaster.extensions import db, passwords
+from quizmaster.models import User, Subject, Chapter, Quiz, Question, Option
+
+# A cohort of students starting a quiz at the same moment, driven through the real routes
+# in-process (login -> dashboard -> take_quiz page by page -> submit) on a temp SQLite file:
+#   python -m quizmaster.benchmarks.loadtest --users 200 --concurrency 32 --output before.json
+#   python -m quizmaster.benchmarks.loadtest --users 200 --concurrency 32 --compare before.json
+# --flow api runs the same cohort through /api/quizzes/<id> and its one-shot submit instead.
+
+PERCENTILES = (50, 95, 99)
+
+
+class Recorder:
+    # Per-route latencies plus the time each request spent blocked on SQLite's write lock.
+    # Requests run in the calling thread under the test client, so a thread-local tally
+    # attributes DB time to the route being timed.
+    def __init__(self):
+        self.routes = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def listen(self, engine):
+        # busy_timeout waits happen inside the first write statement of a transaction (taking
+        # the RESERVED lock) and inside COMMIT, so those are the calls that get timed
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            if not statement.lstrip().upper().startswith('SELECT'):
+                self._local.started = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            self._stop()
+
+        @event.listens_for(engine, 'commit')
+        def before_commit(conn):
+            self._local.started = time.perf_counter()
+
+        @event.listens_for(engine, 'handle_error')
+        def on_error(context):
+            self._stop()
+            if 'locked' in str(context.original_exception):
+                self._local.lock_errors = getattr(self._local, 'lock_errors', 0) + 1
+
+        @event.listens_for(Session, 'after_commit')
+        def after_commit(session):
+            self._stop()
+
+    def _stop(self):
+        started = getattr(self._local, 'started', None)
+        if started is not None:
+            self._local.lock_wait = getattr(self._local, 'lock_wait', 0.0) + time.perf_counter() - started
+            self._local.started = None
+
+    def timed(self, route, call):
+        self._local.lock_wait = 0.0
+        self._local.lock_errors = 0
+        self._local.started = None
+        start = time.perf_counter()
+        try:
+            response = call()
+            ok = response.status_code < 400
+        except OperationalError:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats = self.routes.setdefault(route, {'latency': [], 'lock_wait': [], 'errors': 0, 'lock_errors': 0})
+            stats['latency'].append(elapsed)
+            stats['lock_wait'].append(self._local.lock_wait)
+            stats['errors'] += not ok
+            stats['lock_errors'] += self._local.lock_errors
+        return response if ok else None
+
+
+def percentile(values, p):
+    # Nearest-rank on an already sorted list
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+
+def summarize(samples, wall):
+    latency = sorted(samples['latency'])
+    lock_wait = sorted(samples['lock_wait'])
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        'requests': len(latency),
+        'errors': samples['errors'],
+        'throughput': round(len(latency) / wall, 2),
+        'latency_ms': dict({f'p{p}': ms(percentile(latency, p)) for p in PERCENTILES},
+                           mean=ms(sum(latency) / len(latency)), max=ms(latency[-1])),
+        'lock_wait_ms': dict({f'p{p}': ms(percentile(lock_wait, p)) for p in PERCENTILES},
+                             total=ms(sum(lock_wait))),
+        'lock_errors': samples['lock_errors'],
+    }
+
+
+def seed(n_users, n_quizzes, n_questions, password):
+    # Every student shares one password hash, so seeding doesn't pay the hash cost per user
+    password_hash = passwords.hash(password)
+    db.session.add_all([
+        User(email=f'student{i}@quiz.com', full_name=f'Student {i}', password_hash=password_hash, is_admin=False)
+        for i in range(n_users)
+    ])
+    subject = Subject(name='Load test')
+    db.session.add(subject)
+    db.session.flush()
+    chapter = Chapter(subject_id=subject.id, name='Load test')
+    db.session.add(chapter)
+    db.session.flush()
+    quizzes = {}
+    for i in range(n_quizzes):
+        quiz = Quiz(chapter_id=chapter.id, title=f'Quiz {i}', time_duration='00:30')
+        db.session.add(quiz)
+        db.session.flush()
+        quizzes[quiz.id] = []
+        for j in range(n_questions):
+            question = Question(quiz_id=quiz.id, text=f'Question {j}')
+            db.session.add(question)
+            db.session.flush()
+            options = [Option(question_id=question.id, text=f'Option {k}') for k in range(4)]
+            db.session.add_all(options)
+            db.session.flush()
+            question.correct_option_id = options[0].id
+            quizzes[quiz.id].append((question.id, [option.id for option in options]))
+    db.session.commit()
+    return quizzes
+
+
+def html_session(client, recorder, quiz_id, questions, rng):
+    recorder.timed('GET /quiz/<id>', lambda: client.get(f'/quiz/{quiz_id}'))
+    for index, (question_id, option_ids) in enumerate(questions):
+        if index == len(questions) - 1:
+            data = {'selected_option': rng.choice(option_ids), 'action': 'submit'}
+            recorder.timed('POST /quiz/<id> submit', lambda: client.post(f'/quiz/{quiz_id}', data=data))
+        else:
+            data = {'selected_option': rng.choice(option_ids), 'action': 'next'}
+            recorder.timed('POST /quiz/<id> next', lambda: client.post(f'/quiz/{quiz_id}', data=data))
+
+
+def api_session(client, recorder, quiz_id, questions, rng):
+    recorder.timed('GET /api/quizzes/<id>', lambda: client.get(f'/api/quizzes/{quiz_id}'))
+    answers = {str(question_id): rng.choice(option_ids) for question_id, option_ids in questions}
+    recorder.timed('POST /api/quizzes/<id>/submit',
+                   lambda: client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': answers}))
+
+
+def student(app, recorder, flow, quizzes, password, seed_value, i):
+    rng = random.Random(seed_value + i)
+    client = app.test_client()
+    login = recorder.timed('POST /login', lambda: client.post(
+        '/login', data={'email': f'student{i}@quiz.com', 'password': password}))
+    if login is None:
+        return
+    recorder.timed('GET /dashboard', lambda: client.get('/dashboard'))
+    quiz_id = list(quizzes)[i % len(quizzes)]
+    flow(client, recorder, quiz_id, quizzes[quiz_id], rng)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(dict({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'loadtest.db')}",
+            'QUIZ_PROGRESS_PATH': os.path.join(tmp, 'progress.db'),
+            'WTF_CSRF_ENABLED': False,
+        }, **({'PASSWORD_HASH_METHOD': args.hash_method} if args.hash_method else {})))
+        try:
+            app.jinja_env.get_template('quiz.html')
+        except TemplateNotFound:
+            # Checkouts without the templates directory still exercise everything but rendering
+            print('templates not found; pages render as empty strings')
+            app.jinja_loader = FunctionLoader(lambda name: '')
+        recorder = Recorder()
+        with app.app_context():
+            quizzes = seed(args.users, args.quizzes, args.questions, args.password)
+            recorder.listen(db.engine)
+        flow = api_session if args.flow == 'api' else html_session
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda i: student(app, recorder, flow, quizzes, args.password, args.seed, i),
+                          range(args.users)))
+        wall = time.perf_counter() - start
+
+    total = {'latency': [], 'lock_wait': [], 'errors': 0, 'lock_errors': 0}
+    for samples in recorder.routes.values():
+        for key in total:
+            total[key] += samples[key]
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'params': vars(args),
+            'wall_seconds': round(wall, 3),
+        },
+        'overall': summarize(total, wall),
+        'routes': {route: summarize(samples, wall) for route, samples in sorted(recorder.routes.items())},
+    }
+
+
+def report(results, baseline=None):
+    print(f"{'route':<32} {'req':>6} {'err':>4} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'lock p95':>9}")
+    rows = list(results['routes'].items()) + [('overall', results['overall'])]
+    for route, stats in rows:
+        line = (f"{route:<32} {stats['requests']:>6} {stats['errors']:>4} {stats['throughput']:>8.1f} "
+                f"{stats['latency_ms']['p50']:>8.2f} {stats['latency_ms']['p95']:>8.2f} "
+                f"{stats['latency_ms']['p99']:>8.2f} {stats['lock_wait_ms']['p95']:>9.2f}")
+        previous = (baseline or {}).get('routes', {}).get(route) if route != 'overall' else (baseline or {}).get('overall')
+        if previous:
+            change = stats['latency_ms']['p95'] / previous['latency_ms']['p95'] - 1 if previous['latency_ms']['p95'] else 0
+            line += f'  p95 {change:+.0%} vs {baseline["meta"].get("revision") or "baseline"}'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--quizzes', type=int, default=5)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--flow', choices=['html', 'api'], default='html')
+    parser.add_argument('--hash-method', help='Password hash method; defaults to the app setting.')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='loadtest.json')
+    parser.add_argument('--compare', help='Results file from an earlier run to compare against.')
+    args = parser.parse_args()
+    results = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
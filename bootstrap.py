@@ -0,0 +1,100 @@
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from quizmaster.extensions import db
+from quizmaster.models import User
+from quizmaster import analytics, mastery, migrations, search, stats
+
+# Schema setup and the admin account, run by create_app() unless FAST_STARTUP is set. With it
+# set, workers boot without touching the database and a deploy runs `flask init-db` and
+# `flask seed` once instead, so workers starting together don't queue on the write lock.
+
+ADMIN_EMAIL = 'admin@quiz.com'
+ADMIN_PASSWORD = 'admin123'
+
+
+def init_db():
+    db.create_all()
+    migrations.upgrade()
+    search.create_index()
+    stats.ensure_row()
+    analytics.backfill()
+    mastery.backfill()
+
+
+def seed_admin(email=ADMIN_EMAIL, password=ADMIN_PASSWORD):
+    # Creates the admin account if there is none; returns it either way
+    admin = User.query.filter_by(is_admin=True).first()
+    if not admin:
+        admin = User(
+            email=email,
+            full_name='Quiz Master Admin',
+            qualification='Administrator',
+            dob=None,
+            is_admin=True
+        )
+        admin.set_password(password)
+        db.session.add(admin)
+        db.session.commit()
+    return admin
+
+
+class StartupTimer:
+    # Wall time of each create_app() phase, logged once the app is built and kept in
+    # app.extensions['startup'] for `flask startup-report` and /metrics
+    def __init__(self, started=None):
+        self.started = started or time.perf_counter()
+        self._last = self.started
+        self.phases = {}
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.phases[name] = now - self._last
+        self._last = now
+
+    def finish(self, app, import_seconds=None):
+        # import_seconds: time spent importing the app module, paid once per process
+        total = self._last - self.started
+        app.extensions['startup'] = {'total': total, 'phases': dict(self.phases), 'imports': import_seconds,
+                                     'fast': app.config['FAST_STARTUP']}
+        app.logger.info('App started in %.1f ms after %.1f ms of imports (%s)', total * 1000,
+                        (import_seconds or 0) * 1000,
+                        ', '.join(f'{name} {seconds * 1000:.1f} ms' for name, seconds in self.phases.items()))
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create tables, apply migrations and build the search index and rollups."""
+    init_db()
+    click.echo('Database initialised.')
+
+
+@click.command('seed')
+@click.option('--email', default=ADMIN_EMAIL)
+@click.option('--password', default=ADMIN_PASSWORD)
+@with_appcontext
+def seed_command(email, password):
+    """Create the admin account if there isn't one."""
+    admin = seed_admin(email, password)
+    click.echo(f'Admin account: {admin.email}')
+
+
+@click.command('startup-report')
+@with_appcontext
+def startup_report_command():
+    """Show how long this process spent in each phase of create_app()."""
+    startup = current_app.extensions['startup']
+    if startup['imports'] is not None:
+        click.echo(f"{'imports':<12} {startup['imports'] * 1000:8.1f} ms  (before create_app)")
+    for name, seconds in startup['phases'].items():
+        click.echo(f'{name:<12} {seconds * 1000:8.1f} ms')
+    click.echo(f"{'total':<12} {startup['total'] * 1000:8.1f} ms{'  (fast startup)' if startup['fast'] else ''}")
+
+
+def init_app(app):
+    app.config.setdefault('FAST_STARTUP', False)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(startup_report_command)
@@ -0,0 +1,118 @@
+import threading
+from datetime import datetime
+from sqlalchemy import event, inspect, select, update
+from quizmaster.extensions import db
+from quizmaster.models import Subject, Chapter, Quiz, SiteStats
+from quizmaster.stats import STATS_ID
+
+
+def current_version():
+    return db.session.execute(select(SiteStats.catalog_version).where(SiteStats.id == STATS_ID)).scalar() or 0
+
+
+def bump_version(connection=None):
+    stmt = update(SiteStats).where(SiteStats.id == STATS_ID).values(catalog_version=SiteStats.catalog_version + 1,
+                                                                   catalog_changed_at=datetime.utcnow())
+    (connection or db.session).execute(stmt)
+
+
+# Question changes bump quiz.questions_version; the catalog doesn't show questions
+NOT_IN_CATALOG = {'questions_version', 'updated_at'}
+
+
+def _on_change(mapper, connection, target):
+    bump_version(connection)
+
+
+def _on_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[column.key].history.has_changes()
+           for column in mapper.column_attrs if column.key not in NOT_IN_CATALOG):
+        bump_version(connection)
+
+
+# Any subject, chapter or quiz write, from the admin routes or the importer, bumps the
+# shared version in the same transaction, so every worker's cached tree goes stale together.
+for _model in (Subject, Chapter, Quiz):
+    event.listen(_model, 'after_insert', _on_change)
+    event.listen(_model, 'after_update', _on_update)
+    event.listen(_model, 'after_delete', _on_change)
+
+
+class Catalog:
+    # Immutable snapshot of the subject -> chapter -> quiz tree at one catalog version
+    def __init__(self, version, subjects, chapters, quizzes, last_modified=None):
+        self.version = version
+        self.last_modified = last_modified
+        self.subjects = subjects
+        self.chapters_by_subject = {}
+        self.quizzes_by_chapter = {}
+        for chapter in chapters:
+            self.chapters_by_subject.setdefault(chapter['subject_id'], []).append(chapter)
+        for quiz in quizzes:
+            self.quizzes_by_chapter.setdefault(quiz['chapter_id'], []).append(quiz)
+
+    def chapters(self, subject_id):
+        return self.chapters_by_subject.get(subject_id, [])
+
+    def quizzes(self, chapter_id):
+        return self.quizzes_by_chapter.get(chapter_id, [])
+
+    def as_dict(self):
+        return {
+            'version': self.version,
+            'subjects': [
+                dict(subject, chapters=[
+                    dict(chapter, quizzes=self.quizzes(chapter['id']))
+                    for chapter in self.chapters(subject['id'])
+                ])
+                for subject in self.subjects
+            ]
+        }
+
+
+class CatalogCache:
+    def __init__(self):
+        self._catalog = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.clear()
+
+    def get(self):
+        version = current_version()
+        catalog = self._catalog
+        if catalog is not None and catalog.version == version:
+            return catalog
+        with self._lock:
+            if self._catalog is None or self._catalog.version != version:
+                self._catalog = self.build(version)
+            return self._catalog
+
+    def build(self, version):
+        subjects = [
+            {'id': id_, 'name': name, 'description': description}
+            for id_, name, description in db.session.execute(
+                select(Subject.id, Subject.name, Subject.description).order_by(Subject.name, Subject.id))
+        ]
+        chapters = [
+            {'id': id_, 'subject_id': subject_id, 'name': name, 'description': description}
+            for id_, subject_id, name, description in db.session.execute(
+                select(Chapter.id, Chapter.subject_id, Chapter.name, Chapter.description)
+                .order_by(Chapter.name, Chapter.id))
+        ]
+        quizzes = [
+            {'id': id_, 'chapter_id': chapter_id, 'title': title, 'difficulty': difficulty,
+             'date_of_quiz': date_of_quiz.isoformat() if date_of_quiz else None, 'time_duration': time_duration}
+            for id_, chapter_id, title, difficulty, date_of_quiz, time_duration in db.session.execute(
+                select(Quiz.id, Quiz.chapter_id, Quiz.title, Quiz.difficulty, Quiz.date_of_quiz, Quiz.time_duration)
+                .order_by(Quiz.title, Quiz.id))
+        ]
+        # Not max(updated_at): a delete leaves no row behind to move that forward
+        last_modified = db.session.execute(
+            select(SiteStats.catalog_changed_at).where(SiteStats.id == STATS_ID)).scalar()
+        return Catalog(version, subjects, chapters, quizzes, last_modified)
+
+    def clear(self):
+        with self._lock:
+            self._catalog = None
@@ -0,0 +1,48 @@
+import os
+
+# Every key can be overridden from the environment with a QUIZMASTER_ prefix, e.g.
+# QUIZMASTER_SQLALCHEMY_DATABASE_URI=postgresql://... or QUIZMASTER_DB_POOL_SIZE=20.
+# Values are parsed as JSON when possible, so numbers and booleans come through typed.
+DEFAULTS = {
+    'SECRET_KEY': 'your-secret-key',
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///quizmaster.db',
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    # Dashboard and report queries go here when set; "primary" reuses the primary
+    # database through a separate read-only connection pool
+    'READ_DATABASE_URI': None,
+    'DB_POOL_SIZE': 5,
+    'DB_MAX_OVERFLOW': 10,
+    'DB_POOL_TIMEOUT': 30,
+    'DB_POOL_RECYCLE': 1800,
+    'DB_POOL_PRE_PING': True,
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT': 5000,  # milliseconds
+    'SQLITE_CACHE_SIZE': -64000,  # negative means KiB, i.e. 64 MB of page cache
+    # Per-request route/SQL instrumentation for the admin-only /metrics endpoint. Statements
+    # slower than SLOW_QUERY_MS (milliseconds) are logged even with metrics off.
+    'METRICS_ENABLED': False,
+    'SLOW_QUERY_MS': None,
+    # "rows" writes one AttemptAnswer per question; "packed" stores them in one blob per attempt
+    'ANSWER_STORAGE': 'rows',
+    # Journal submits to a local file and write them to the database in batches from a
+    # background thread; SUBMISSION_QUEUE_PATH defaults to instance/submission_queue.db
+    'SUBMISSION_QUEUE_ENABLED': False,
+    'SUBMISSION_FLUSH_BATCH': 500,
+    'SUBMISSION_FLUSH_INTERVAL': 0.2,  # seconds
+    # `flask archive-attempts` moves older attempts to a compressed file, ARCHIVE_PATH
+    # (default instance/attempt_archive.db); history and reviews still read them from there
+    'ARCHIVE_AFTER_DAYS': 365,
+    'ARCHIVE_BATCH_SIZE': 1000,
+    # Skip create_all, migrations and admin seeding in create_app(); run `flask init-db` and
+    # `flask seed` once per deploy instead
+    'FAST_STARTUP': False,
+}
+
+
+def load_config(app, overrides=None):
+    app.config.update(DEFAULTS)
+    if os.environ.get('DATABASE_URL'):
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+    app.config.from_prefixed_env('QUIZMASTER')
+    app.config.update(overrides or {})
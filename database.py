@@ -0,0 +1,96 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from quizmaster.extensions import db
+
+READ_BIND = 'read'
+
+
+def _is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def _is_sqlite_memory(uri):
+    return _is_sqlite(uri) and make_url(uri).database in (None, '', ':memory:')
+
+
+def engine_options(config, uri):
+    if _is_sqlite_memory(uri):
+        # Flask-SQLAlchemy pins in-memory databases to a single StaticPool connection
+        return {}
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if _is_sqlite(uri):
+        options['connect_args'] = {'timeout': config['SQLITE_BUSY_TIMEOUT'] / 1000}
+    else:
+        options['pool_recycle'] = config['DB_POOL_RECYCLE']
+        options['pool_pre_ping'] = config['DB_POOL_PRE_PING']
+    return options
+
+
+def configure_engines(app):
+    # Must run before db.init_app(), which builds the engines from these settings
+    config = app.config
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(config, uri))
+    read_uri = config.get('READ_DATABASE_URI')
+    if read_uri == 'primary':
+        read_uri = uri
+    if read_uri and not _is_sqlite_memory(read_uri):
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[READ_BIND] = {'url': read_uri, **engine_options(config, read_uri)}
+        config['SQLALCHEMY_BINDS'] = binds
+
+
+def init_app(app):
+    # Apply connection pragmas to every SQLite engine; must run before the first connect
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if engine.dialect.name == 'sqlite':
+                _listen_sqlite_pragmas(engine, app.config, read_only=bind_key == READ_BIND)
+
+
+def _listen_sqlite_pragmas(engine, config, read_only=False):
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA cache_size = {int(config['SQLITE_CACHE_SIZE'])}",
+        'PRAGMA temp_store = MEMORY',
+        # Off by default in SQLite; the schema relies on ON DELETE CASCADE / SET NULL
+        'PRAGMA foreign_keys = ON',
+    ]
+    if config['SQLITE_JOURNAL_MODE'] and not read_only:
+        pragmas.insert(0, f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+    if read_only:
+        pragmas.append('PRAGMA query_only = ON')
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def read_engine():
+    return db.engines.get(READ_BIND)
+
+
+def read_execute(statement, params=None):
+    # Dashboard and report queries; served by the read-only bind when one is configured
+    engine = read_engine()
+    if engine is None:
+        return db.session.execute(statement, params)
+    return db.session.execute(statement, params, bind_arguments={'bind': engine})
+
+
+def upsert(model):
+    # INSERT that supports on_conflict_do_update on SQLite and PostgreSQL. The dialect module is
+    # imported on first use, so SQLite deployments never load the PostgreSQL one.
+    if db.session.get_bind().dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
@@ -0,0 +1,191 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, select
+from quizmaster.extensions import db
+from quizmaster.models import Subject, Chapter, Quiz, Question, Attempt, ChapterMastery, DeletionJob
+from quizmaster import catalog, mastery, search, stats
+from quizmaster.archive import archive
+
+KINDS = {'subject': Subject, 'chapter': Chapter, 'quiz': Quiz}
+
+
+def _quiz_ids(kind, target_id):
+    # SELECT of the ids of every quiz under the target, for use as a subquery
+    if kind == 'quiz':
+        return select(Quiz.id).where(Quiz.id == target_id)
+    if kind == 'chapter':
+        return select(Quiz.id).where(Quiz.chapter_id == target_id)
+    return select(Quiz.id).join(Chapter, Quiz.chapter_id == Chapter.id).where(Chapter.subject_id == target_id)
+
+
+def _subject_id(kind, target_id):
+    if kind == 'subject':
+        return target_id
+    if kind == 'chapter':
+        return db.session.execute(select(Chapter.subject_id).where(Chapter.id == target_id)).scalar()
+    return db.session.execute(
+        select(Chapter.subject_id).join(Quiz, Quiz.chapter_id == Chapter.id).where(Quiz.id == target_id)
+    ).scalar()
+
+
+def _count_attempts(kind, target_id):
+    return db.session.execute(
+        select(func.count(Attempt.id)).where(Attempt.quiz_id.in_(_quiz_ids(kind, target_id)))
+    ).scalar()
+
+
+def delete_attempts(kind, target_id, batch_size):
+    # Attempts (and, by cascade, their answers) go first in short transactions, so a subject
+    # with millions of answers never holds the write lock for long. Yields rows deleted per batch.
+    quiz_ids = _quiz_ids(kind, target_id)
+    while True:
+        batch = select(Attempt.id).where(Attempt.quiz_id.in_(quiz_ids)).limit(batch_size)
+        deleted = db.session.execute(delete(Attempt).where(Attempt.id.in_(batch)),
+                                     execution_options={'synchronize_session': False}).rowcount
+        if not deleted:
+            return
+        stats.adjust(attempts=-deleted)
+        yield deleted
+
+
+def delete_target(kind, target_id):
+    # One statement; ON DELETE CASCADE removes chapters, quizzes, questions, options and
+    # what's left of their attempts. Mapper events don't see cascaded rows, so the search
+    # index, catalog version, counters, mastery rollups, archive and caches are brought up to date here.
+    model = KINDS[kind]
+    quiz_ids = _quiz_ids(kind, target_id)
+    subject_id = _subject_id(kind, target_id)
+    deleted_quiz_ids = db.session.execute(quiz_ids).scalars().all()
+    store = archive()
+    # Archived attempts count too, and are forgotten along with their quizzes
+    removed = {
+        'quizzes': len(deleted_quiz_ids),
+        'attempts': _count_attempts(kind, target_id) + (store.count(deleted_quiz_ids) if store else 0),
+    }
+    if kind == 'subject':
+        removed['subjects'] = 1
+        removed['chapters'] = db.session.execute(
+            select(func.count(Chapter.id)).where(Chapter.subject_id == target_id)).scalar()
+    elif kind == 'chapter':
+        removed['chapters'] = 1
+    if kind != 'subject':
+        # Users with attempts under the target all have a rollup row for its chapter
+        chapter_id = target_id if kind == 'chapter' else \
+            db.session.execute(select(Quiz.chapter_id).where(Quiz.id == target_id)).scalar()
+        affected_users = db.session.execute(
+            select(ChapterMastery.user_id).where(ChapterMastery.chapter_id == chapter_id)).scalars().all()
+    search.remove_rows('question', select(Question.id).where(Question.quiz_id.in_(quiz_ids)))
+    search.remove_rows('quiz', quiz_ids)
+    if kind == 'subject':
+        search.remove_rows('chapter', select(Chapter.id).where(Chapter.subject_id == target_id))
+    search.remove_rows(kind, [target_id])
+    if db.session.execute(delete(model).where(model.id == target_id),
+                          execution_options={'synchronize_session': False}).rowcount:
+        stats.adjust(**{name: -count for name, count in removed.items()})
+        if kind != 'subject' and subject_id is not None:
+            # Takes the deleted attempts out of the rollups in the same transaction as the delete
+            mastery.refresh_users(subject_id, affected_users)
+    catalog.bump_version()
+    db.session.commit()
+    db.session.expire_all()
+    if store:
+        store.forget(deleted_quiz_ids)
+    # Other workers drop theirs when the id comes back with a new quiz_version
+    for name in ('answer_keys', 'quiz_payloads'):
+        cache = current_app.extensions.get(name)
+        if cache:
+            cache.evict(deleted_quiz_ids)
+
+
+def run(job, batch_size, progress=None):
+    job.status = 'running'
+    db.session.commit()
+    try:
+        for deleted in delete_attempts(job.kind, job.target_id, batch_size):
+            job.deleted += deleted
+            db.session.commit()
+            if progress:
+                progress(job)
+        delete_target(job.kind, job.target_id)
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = str(exc)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        raise
+    return job
+
+
+class DeletionService:
+    # Deletes subjects, chapters and quizzes with set-based statements. Targets with few
+    # attempts are deleted inline; larger ones run on a single background worker and report
+    # progress through their DeletionJob row.
+    def __init__(self):
+        self.app = None
+        self.batch_size = 1000
+        self.inline_limit = 1000
+        self._executor = None
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.setdefault('DELETE_BATCH_SIZE', 1000)
+        self.inline_limit = app.config.setdefault('DELETE_INLINE_LIMIT', 1000)  # attempts
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='deletion')
+        app.cli.add_command(delete_command)
+
+    def submit(self, kind, target_id):
+        job = DeletionJob(kind=kind, target_id=target_id, total=_count_attempts(kind, target_id))
+        db.session.add(job)
+        db.session.commit()
+        if job.total <= self.inline_limit:
+            return run(job, self.batch_size)
+        self._executor.submit(self._run_in_background, job.id)
+        return job
+
+    def _run_in_background(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(DeletionJob, job_id)
+            try:
+                run(job, self.batch_size)
+            except Exception:
+                self.app.logger.exception('Deletion job %s failed', job_id)
+            finally:
+                db.session.remove()
+
+
+def job_status(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'target_id': job.target_id,
+        'status': job.status,
+        'total': job.total,
+        'deleted': job.deleted,
+        'percent': 100 if job.status == 'done' else int(job.deleted / job.total * 100) if job.total else 0,
+        'error': job.error,
+    }
+
+
+@click.command('delete-catalog')
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.argument('target_id', type=int)
+@click.option('--batch-size', type=int, default=None, help='Attempts deleted per transaction.')
+@with_appcontext
+def delete_command(kind, target_id, batch_size):
+    """Delete a subject, chapter or quiz with everything under it, showing progress."""
+    if db.session.get(KINDS[kind], target_id) is None:
+        raise click.ClickException(f'No {kind} with id {target_id}.')
+    job = DeletionJob(kind=kind, target_id=target_id, total=_count_attempts(kind, target_id))
+    db.session.add(job)
+    db.session.commit()
+    run(job, batch_size or current_app.config['DELETE_BATCH_SIZE'],
+        progress=lambda job: click.echo(f'{job.deleted}/{job.total} attempts deleted'))
+    click.echo(f'Deleted {kind} {target_id} and {job.deleted} attempts.')
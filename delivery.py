@@ -0,0 +1,99 @@
+import json
+import threading
+from collections import OrderedDict
+from quizmaster.extensions import db
+from quizmaster.grading import quiz_version
+from quizmaster.models import Question, Option
+
+
+class QuizPayload:
+    # Everything a client needs to run a quiz in one response; correct answers are never included
+    __slots__ = ('quiz_id', 'version', 'body', 'options_by_question')
+
+    def __init__(self, quiz, questions, options):
+        self.quiz_id = quiz.id
+        self.version = quiz_version(quiz)
+        self.options_by_question = {}
+        for question_id, option_id, _ in options:
+            self.options_by_question.setdefault(question_id, set()).add(option_id)
+        option_rows = {}
+        for question_id, option_id, text in options:
+            option_rows.setdefault(question_id, []).append({'id': option_id, 'text': text})
+        self.body = json.dumps({
+            'quiz': {
+                'id': quiz.id,
+                'title': quiz.title,
+                'description': quiz.description,
+                'time_duration': quiz.time_duration,
+                'duration_seconds': quiz.duration_seconds,
+                'version': quiz.questions_version,
+            },
+            'questions': [
+                {'id': question_id, 'text': text, 'options': option_rows.get(question_id, [])}
+                for question_id, text in questions
+            ],
+        })
+
+    def validate(self, answers):
+        # Returns {question_id: option_id} for answers that name an option of that question;
+        # null marks a question left unanswered
+        cleaned = {}
+        for question_id, option_id in answers.items():
+            if option_id is None:
+                continue
+            try:
+                question_id, option_id = int(question_id), int(option_id)
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid answer: {question_id!r}: {option_id!r}')
+            if option_id not in self.options_by_question.get(question_id, ()):
+                raise ValueError(f'Option {option_id} does not belong to question {question_id}')
+            cleaned[question_id] = option_id
+        return cleaned
+
+
+class QuizPayloadCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._payloads = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.setdefault('QUIZ_PAYLOAD_CACHE_SIZE', self.max_entries)
+        app.extensions['quiz_payloads'] = self
+
+    def get(self, quiz):
+        # Keyed like the answer key cache; the body also carries the quiz's title and duration,
+        # so edits to the quiz itself make every worker rebuild too
+        with self._lock:
+            payload = self._payloads.get(quiz.id)
+            if payload is not None and payload.version == quiz_version(quiz):
+                self._payloads.move_to_end(quiz.id)
+                return payload
+        payload = self.build(quiz)
+        with self._lock:
+            self._payloads[quiz.id] = payload
+            self._payloads.move_to_end(quiz.id)
+            while len(self._payloads) > self.max_entries:
+                self._payloads.popitem(last=False)
+        return payload
+
+    def build(self, quiz):
+        questions = db.session.query(Question.id, Question.text) \
+            .filter(Question.quiz_id == quiz.id) \
+            .order_by(Question.id) \
+            .all()
+        options = db.session.query(Option.question_id, Option.id, Option.text) \
+            .join(Question, Option.question_id == Question.id) \
+            .filter(Question.quiz_id == quiz.id) \
+            .order_by(Option.question_id, Option.id) \
+            .all()
+        return QuizPayload(quiz, questions, options)
+
+    def evict(self, quiz_ids):
+        with self._lock:
+            for quiz_id in quiz_ids:
+                self._payloads.pop(quiz_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._payloads.clear()
@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+from itertools import groupby
+from types import SimpleNamespace
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from quizmaster.database import read_execute
+from quizmaster.models import Attempt, AttemptAnswer, Chapter, Quiz, User
+from quizmaster import answers as stored_answers
+
+EXPORT_YIELD_PER = 1000
+CHUNK_SIZE = 64 * 1024
+FORMATS = ('csv', 'ndjson')
+MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+ATTEMPT_FIELDS = ['attempt_id', 'user_id', 'email', 'subject_id', 'chapter_id', 'quiz_id',
+                  'quiz_title', 'score', 'completed_at', 'duration']
+ANSWER_FIELDS = ['question_id', 'selected_option_id']
+
+
+def parse_filters(values):
+    # values is any mapping (request.args, click options); unknown keys are ignored
+    filters = {}
+    for key in ('subject_id', 'chapter_id', 'quiz_id'):
+        if values.get(key) not in (None, ''):
+            filters[key] = int(values.get(key))
+    for key in ('since', 'until'):
+        if values.get(key) not in (None, ''):
+            value = values.get(key)
+            filters[key] = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    return filters
+
+
+def attempts_query(filters, include_answers=True):
+    columns = [
+        Attempt.id.label('attempt_id'), Attempt.user_id, User.email, Chapter.subject_id,
+        Quiz.chapter_id, Attempt.quiz_id, Quiz.title.label('quiz_title'), Attempt.score,
+        Attempt.completed_at, Attempt.duration,
+    ]
+    query = select(*columns).join(User, Attempt.user_id == User.id) \
+        .join(Quiz, Attempt.quiz_id == Quiz.id) \
+        .join(Chapter, Quiz.chapter_id == Chapter.id)
+    if include_answers:
+        query = query.add_columns(AttemptAnswer.question_id, AttemptAnswer.selected_option_id, Attempt.packed_answers) \
+            .outerjoin(AttemptAnswer, AttemptAnswer.attempt_id == Attempt.id)
+    if 'subject_id' in filters:
+        query = query.where(Chapter.subject_id == filters['subject_id'])
+    if 'chapter_id' in filters:
+        query = query.where(Quiz.chapter_id == filters['chapter_id'])
+    if 'quiz_id' in filters:
+        query = query.where(Attempt.quiz_id == filters['quiz_id'])
+    if 'since' in filters:
+        query = query.where(Attempt.completed_at >= filters['since'])
+    if 'until' in filters:
+        query = query.where(Attempt.completed_at < filters['until'])
+    order = [Attempt.id]
+    if include_answers:
+        order.append(AttemptAnswer.id)
+    # yield_per streams through a server-side cursor where the driver has one
+    return query.order_by(*order).execution_options(yield_per=EXPORT_YIELD_PER)
+
+
+def _unpacked(rows):
+    # Packed attempts come back as one row with no joined answer; expand them into a row
+    # per answer so they stream exactly like attempts stored as AttemptAnswer rows
+    unpack_for = stored_answers.unpacker(read_execute)
+    for row in rows:
+        if row.packed_answers is None:
+            yield row
+            continue
+        fields = row._asdict()
+        for question_id, option_id in unpack_for(row.quiz_id, row.packed_answers) or [(None, None)]:
+            yield SimpleNamespace(**dict(fields, question_id=question_id, selected_option_id=option_id))
+
+
+def _attempt_record(row):
+    record = {field: getattr(row, field) for field in ATTEMPT_FIELDS}
+    if record['completed_at'] is not None:
+        record['completed_at'] = record['completed_at'].isoformat()
+    return record
+
+
+def _csv_lines(rows, include_answers):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    fields = ATTEMPT_FIELDS + (ANSWER_FIELDS if include_answers else [])
+    writer.writerow(fields)
+    for row in rows:
+        record = _attempt_record(row)
+        values = [record[field] for field in ATTEMPT_FIELDS]
+        if include_answers:
+            values += [row.question_id, row.selected_option_id]
+        writer.writerow(values)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _ndjson_lines(rows, include_answers):
+    if not include_answers:
+        for row in rows:
+            yield json.dumps(_attempt_record(row)) + '\n'
+        return
+    # Rows arrive ordered by attempt, so each attempt's answers are consecutive
+    for _, attempt_rows in groupby(rows, key=lambda row: row.attempt_id):
+        first = next(attempt_rows)
+        record = _attempt_record(first)
+        answers = [first] + list(attempt_rows)
+        record['answers'] = [
+            {'question_id': row.question_id, 'selected_option_id': row.selected_option_id}
+            for row in answers if row.question_id is not None
+        ]
+        yield json.dumps(record) + '\n'
+
+
+def export_attempts(fmt='csv', filters=None, include_answers=True, chunk_size=CHUNK_SIZE):
+    # Generator of text chunks; memory stays bounded by yield_per and chunk_size
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported export format: {fmt}')
+    rows = read_execute(attempts_query(filters or {}, include_answers))
+    if include_answers:
+        rows = _unpacked(rows)
+    lines = _csv_lines(rows, include_answers) if fmt == 'csv' else _ndjson_lines(rows, include_answers)
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+@click.command('export-attempts')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), default=None, help='Defaults to stdout.')
+@click.option('--subject-id', type=int)
+@click.option('--chapter-id', type=int)
+@click.option('--quiz-id', type=int)
+@click.option('--since', type=click.DateTime(), help='Completed at or after this time.')
+@click.option('--until', type=click.DateTime(), help='Completed before this time.')
+@click.option('--answers/--no-answers', default=True)
+@with_appcontext
+def export_command(fmt, output, answers, **filter_options):
+    """Stream attempts (and their answers) as CSV or NDJSON."""
+    filters = parse_filters(filter_options)
+    stream = open(output, 'w', newline='', encoding='utf-8') if output else sys.stdout
+    try:
+        for chunk in export_attempts(fmt, filters, include_answers=answers):
+            stream.write(chunk)
+    finally:
+        if output:
+            stream.close()
+
+
+def init_app(app):
+    app.cli.add_command(export_command)
@@ -1,3 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from quizmaster.passwords import PasswordService
+from quizmaster.usercache import UserCache
 
-db = SQLAlchemy() 
\ No newline at end of file
+db = SQLAlchemy()
+passwords = PasswordService()
+user_cache = UserCache() 
\ No newline at end of file
@@ -0,0 +1,81 @@
+import threading
+from array import array
+from collections import OrderedDict
+from operator import eq
+from quizmaster.extensions import db
+from quizmaster.models import Question
+
+UNANSWERED = 0
+NO_CORRECT_OPTION = -1
+
+
+def quiz_version(quiz):
+    # questions_version alone repeats: SQLite hands a deleted quiz's id to the next quiz, which
+    # can reach the same count of question edits. updated_at tells the two rows apart and also
+    # moves on edits to the quiz itself.
+    return quiz.questions_version, quiz.updated_at
+
+
+class AnswerKey:
+    # Question ids and their correct option ids as parallel arrays, ordered by question id
+    __slots__ = ('quiz_id', 'version', 'question_ids', 'correct_option_ids')
+
+    def __init__(self, quiz_id, version, rows):
+        self.quiz_id = quiz_id
+        self.version = version
+        self.question_ids = array('q', (question_id for question_id, _ in rows))
+        self.correct_option_ids = array('q', (correct or NO_CORRECT_OPTION for _, correct in rows))
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def selections(self, answers):
+        # answers maps question id (int or str) to the selected option id
+        answers = {int(k): int(v) for k, v in answers.items() if v}
+        return array('q', (answers.get(question_id, UNANSWERED) for question_id in self.question_ids))
+
+    def grade(self, answers):
+        selected = self.selections(answers)
+        return sum(map(eq, selected, self.correct_option_ids)), selected
+
+
+class AnswerKeyCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.setdefault('ANSWER_KEY_CACHE_SIZE', self.max_entries)
+        app.extensions['answer_keys'] = self
+
+    def get(self, quiz):
+        # Keyed by quiz_version; the question routes bump questions_version on every change
+        with self._lock:
+            key = self._keys.get(quiz.id)
+            if key is not None and key.version == quiz_version(quiz):
+                self._keys.move_to_end(quiz.id)
+                return key
+        key = self.compile(quiz)
+        with self._lock:
+            self._keys[quiz.id] = key
+            self._keys.move_to_end(quiz.id)
+            while len(self._keys) > self.max_entries:
+                self._keys.popitem(last=False)
+        return key
+
+    def compile(self, quiz):
+        rows = db.session.query(Question.id, Question.correct_option_id) \
+            .filter(Question.quiz_id == quiz.id) \
+            .order_by(Question.id) \
+            .all()
+        return AnswerKey(quiz.id, quiz_version(quiz), rows)
+
+    def evict(self, quiz_ids):
+        with self._lock:
+            for quiz_id in quiz_ids:
+                self._keys.pop(quiz_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
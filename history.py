@@ -0,0 +1,85 @@
+from datetime import datetime
+from sqlalchemy import func, select, tuple_
+from quizmaster.database import read_execute
+from quizmaster.models import Attempt, Quiz, Question
+from quizmaster.archive import archive
+
+HISTORY_PAGE_SIZE = 20
+
+
+def encode_cursor(completed_at, attempt_id):
+    return f'{completed_at.isoformat()}_{attempt_id}'
+
+
+def decode_cursor(cursor):
+    # Cursors are "<completed_at iso>_<attempt id>"; anything malformed starts from the top
+    if not cursor:
+        return None
+    try:
+        ts, attempt_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(ts), int(attempt_id)
+    except ValueError:
+        return None
+
+
+def history_query(user_id, position=None, limit=HISTORY_PAGE_SIZE):
+    # One query per page: the quiz is joined in and the question count is a
+    # correlated subquery, so nothing is lazy-loaded per attempt.
+    question_count = (
+        select(func.count(Question.id))
+        .where(Question.quiz_id == Attempt.quiz_id)
+        .correlate(Attempt)
+        .scalar_subquery()
+    )
+    query = (
+        select(Attempt, Quiz, question_count)
+        .join(Quiz, Attempt.quiz_id == Quiz.id)
+        .where(Attempt.user_id == user_id)
+    )
+    if position:
+        query = query.where(tuple_(Attempt.completed_at, Attempt.id) < position)
+    return query.order_by(Attempt.completed_at.desc(), Attempt.id.desc()).limit(limit + 1)
+
+
+def _archived_rows(user_id, position, limit):
+    # Read through to the archive once the live table runs out; archived attempts are older
+    # than anything live, so they simply continue the page
+    store = archive()
+    archived = store.history(user_id, position, limit) if store else []
+    if not archived:
+        return []
+    question_count = (
+        select(func.count(Question.id))
+        .where(Question.quiz_id == Quiz.id)
+        .correlate(Quiz)
+        .scalar_subquery()
+    )
+    quizzes = {quiz.id: (quiz, max_score) for quiz, max_score in read_execute(
+        select(Quiz, question_count).where(Quiz.id.in_({attempt.quiz_id for attempt in archived}))
+    ).all()}
+    return [(attempt, *quizzes[attempt.quiz_id]) for attempt in archived if attempt.quiz_id in quizzes]
+
+
+def user_attempt_history(user_id, cursor=None, limit=HISTORY_PAGE_SIZE):
+    position = decode_cursor(cursor)
+    rows = read_execute(history_query(user_id, position, limit)).all()
+    if len(rows) <= limit:
+        last = rows[-1][0] if rows else None
+        rows += _archived_rows(user_id, (last.completed_at, last.id) if last else position, limit + 1 - len(rows))
+    attempts_data = []
+    for attempt, quiz, max_score in rows[:limit]:
+        percent = int((attempt.score or 0) / (max_score or 1) * 100)
+        attempts_data.append({
+            'id': attempt.id,
+            'quiz': quiz,
+            'score': attempt.score or 0,
+            'max_score': max_score or 1,
+            'percent': percent,
+            'duration': attempt.duration or 0,
+            'completed_at': attempt.completed_at or datetime.utcnow()
+        })
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1][0]
+        next_cursor = encode_cursor(last.completed_at, last.id)
+    return attempts_data, next_cursor
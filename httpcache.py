@@ -0,0 +1,46 @@
+import hashlib
+from datetime import timezone
+from flask import make_response, request, session
+
+
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def _as_http_date(value):
+    # updated_at columns hold naive UTC; HTTP dates have whole-second precision
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+class Validators:
+    # ETag / Last-Modified for one view. Pages are per user (and may carry flashed
+    # messages), so responses are private and must be revalidated every time.
+    def __init__(self, etag, last_modified=None):
+        self.etag = etag
+        self.last_modified = _as_http_date(last_modified)
+
+    def not_modified(self):
+        if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+            return False
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(self.etag)
+        if self.last_modified and request.if_modified_since:
+            return self.last_modified <= request.if_modified_since
+        return False
+
+    def apply(self, response):
+        response.set_etag(self.etag, weak=True)
+        if self.last_modified:
+            response.last_modified = self.last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response
+
+    def not_modified_response(self):
+        return self.apply(make_response('', 304))
+
+    def respond(self, body):
+        return self.apply(make_response(body))
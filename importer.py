@@ -0,0 +1,280 @@
+import csv
+import io
+import json
+import os
+import time
+from datetime import date
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert, update
+from quizmaster.extensions import db
+from quizmaster.models import Subject, Chapter, Quiz, Question, Option
+from quizmaster import search
+
+# Question banks are streamed row by row from CSV or NDJSON. Each row carries its
+# subject/chapter/quiz by name (created on first sight) and one question:
+#   subject, chapter, quiz, question, option_1 .. option_6, correct (1-based)
+# plus optional subject_description, chapter_description, quiz_description,
+# date_of_quiz (YYYY-MM-DD), time_duration (hh:mm), remarks and difficulty.
+# NDJSON rows may give "options" as a list instead of option_N keys.
+
+IMPORT_BATCH_SIZE = 2000
+MAX_OPTIONS = 6
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ('csv', 'ndjson')
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'failed': self.failed,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'errors': self.errors,
+        }
+
+
+def detect_format(filename, default='csv'):
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.ndjson', '.jsonl', '.json'):
+        return 'ndjson'
+    if extension == '.csv':
+        return 'csv'
+    return default
+
+
+def read_rows(stream, fmt):
+    # Yields (line number, row dict); never holds more than one line in memory
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_number, exc
+                continue
+            yield line_number, row
+    else:
+        raise ValueError(f'Unsupported import format: {fmt}')
+
+
+def _text(row, key):
+    value = row.get(key)
+    return str(value).strip() if value is not None else ''
+
+
+def validate_row(row):
+    # Returns a normalised row or raises ValueError with a message for the report
+    if not isinstance(row, dict):
+        raise ValueError(f'Malformed row: {row}')
+    for key in ('subject', 'chapter', 'quiz', 'question'):
+        if not _text(row, key):
+            raise ValueError(f'Missing {key}')
+    options = row.get('options')
+    if isinstance(options, list):
+        options = [str(option).strip() for option in options]
+    else:
+        options = [_text(row, f'option_{i}') for i in range(1, MAX_OPTIONS + 1)]
+    options = [option for option in options if option]
+    if not 2 <= len(options) <= MAX_OPTIONS:
+        raise ValueError(f'Expected 2 to {MAX_OPTIONS} options, got {len(options)}')
+    if any(len(option) > 256 for option in options):
+        raise ValueError('Option text longer than 256 characters')
+    try:
+        correct = int(_text(row, 'correct'))
+    except ValueError:
+        raise ValueError('correct must be the 1-based number of the right option')
+    if not 1 <= correct <= len(options):
+        raise ValueError(f'correct must be between 1 and {len(options)}')
+    date_of_quiz = None
+    if _text(row, 'date_of_quiz'):
+        try:
+            date_of_quiz = date.fromisoformat(_text(row, 'date_of_quiz'))
+        except ValueError:
+            raise ValueError('date_of_quiz must be YYYY-MM-DD')
+    return {
+        'subject': _text(row, 'subject'),
+        'subject_description': _text(row, 'subject_description') or None,
+        'chapter': _text(row, 'chapter'),
+        'chapter_description': _text(row, 'chapter_description') or None,
+        'quiz': _text(row, 'quiz'),
+        'quiz_description': _text(row, 'quiz_description') or None,
+        'date_of_quiz': date_of_quiz,
+        'time_duration': _text(row, 'time_duration') or None,
+        'remarks': _text(row, 'remarks') or None,
+        'difficulty': _text(row, 'difficulty') or None,
+        'question': _text(row, 'question'),
+        'options': options,
+        'correct_index': correct - 1,
+    }
+
+
+class _Catalog:
+    # Resolves names to ids once per import; unseen subjects, chapters and quizzes are
+    # created through the ORM so search, stats and other mapper listeners see them.
+    def __init__(self):
+        self.subjects = {}
+        self.chapters = {}
+        self.quizzes = {}
+
+    def quiz_id(self, row):
+        subject_id = self.subjects.get(row['subject'])
+        if subject_id is None:
+            subject = Subject.query.filter_by(name=row['subject']).first()
+            if subject is None:
+                subject = Subject(name=row['subject'], description=row['subject_description'])
+                db.session.add(subject)
+                db.session.flush()
+            subject_id = self.subjects[row['subject']] = subject.id
+        chapter_key = (subject_id, row['chapter'])
+        chapter_id = self.chapters.get(chapter_key)
+        if chapter_id is None:
+            chapter = Chapter.query.filter_by(subject_id=subject_id, name=row['chapter']).first()
+            if chapter is None:
+                chapter = Chapter(subject_id=subject_id, name=row['chapter'], description=row['chapter_description'])
+                db.session.add(chapter)
+                db.session.flush()
+            chapter_id = self.chapters[chapter_key] = chapter.id
+        quiz_key = (chapter_id, row['quiz'])
+        quiz_id = self.quizzes.get(quiz_key)
+        if quiz_id is None:
+            quiz = Quiz.query.filter_by(chapter_id=chapter_id, title=row['quiz']).first()
+            if quiz is None:
+                quiz = Quiz(
+                    chapter_id=chapter_id,
+                    title=row['quiz'],
+                    description=row['quiz_description'],
+                    date_of_quiz=row['date_of_quiz'],
+                    time_duration=row['time_duration'],
+                    remarks=row['remarks'],
+                    difficulty=row['difficulty']
+                )
+                db.session.add(quiz)
+                db.session.flush()
+            quiz_id = self.quizzes[quiz_key] = quiz.id
+        return quiz_id
+
+    def forget_pending(self):
+        # After a rollback, ids created in the failed batch no longer exist
+        self.subjects.clear()
+        self.chapters.clear()
+        self.quizzes.clear()
+
+
+def _insert_batch(batch):
+    # batch: list of (quiz_id, row); one transaction, three executemany statements
+    question_ids = db.session.scalars(
+        insert(Question).returning(Question.id, sort_by_parameter_order=True),
+        [{'quiz_id': quiz_id, 'text': row['question']} for quiz_id, row in batch]
+    ).all()
+    option_ids = db.session.scalars(
+        insert(Option).returning(Option.id, sort_by_parameter_order=True),
+        [{'question_id': question_id, 'text': option}
+         for question_id, (_, row) in zip(question_ids, batch)
+         for option in row['options']]
+    ).all()
+    corrections = []
+    offset = 0
+    for question_id, (_, row) in zip(question_ids, batch):
+        corrections.append({'id': question_id, 'correct_option_id': option_ids[offset + row['correct_index']]})
+        offset += len(row['options'])
+    db.session.execute(update(Question), corrections)
+    quiz_ids = {quiz_id for quiz_id, _ in batch}
+    db.session.execute(
+        update(Quiz).where(Quiz.id.in_(quiz_ids)).values(questions_version=Quiz.questions_version + 1)
+    )
+    search.index_rows('question', question_ids)
+    db.session.commit()
+
+
+def import_questions(stream, fmt='csv', batch_size=IMPORT_BATCH_SIZE):
+    report = ImportReport()
+    catalog = _Catalog()
+    batch = []
+    batch_lines = []
+
+    def flush():
+        try:
+            _insert_batch(batch)
+            report.imported += len(batch)
+        except Exception as exc:
+            db.session.rollback()
+            catalog.forget_pending()
+            for line in batch_lines:
+                report.error(line, f'Batch rejected by the database: {exc.__class__.__name__}')
+        batch.clear()
+        batch_lines.clear()
+
+    for line, raw in read_rows(stream, fmt):
+        report.rows += 1
+        if isinstance(raw, Exception):
+            report.error(line, f'Invalid JSON: {raw}')
+            continue
+        try:
+            row = validate_row(raw)
+        except ValueError as exc:
+            report.error(line, str(exc))
+            continue
+        batch.append((catalog.quiz_id(row), row))
+        batch_lines.append(line)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    else:
+        db.session.commit()
+    return report.finish()
+
+
+def import_upload(file_storage, fmt=None, batch_size=IMPORT_BATCH_SIZE):
+    # Werkzeug spools large uploads to disk, so wrapping the stream keeps memory flat
+    fmt = fmt or detect_format(file_storage.filename)
+    stream = io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline='')
+    return import_questions(stream, fmt, batch_size)
+
+
+@click.command('import-questions')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default=None, help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+@with_appcontext
+def import_command(path, fmt, batch_size):
+    """Stream subjects, chapters, quizzes, questions and options from CSV or NDJSON."""
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        report = import_questions(stream, fmt or detect_format(path), batch_size)
+    click.echo(f'{report.imported}/{report.rows} rows imported in {report.seconds:.2f}s '
+               f'({report.rows_per_second:.0f} rows/s), {report.failed} failed')
+    for error in report.errors[:20]:
+        click.echo(f"  line {error['line']}: {error['error']}")
+
+
+def init_app(app):
+    app.cli.add_command(import_command)
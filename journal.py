@@ -0,0 +1,213 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from quizmaster.extensions import db
+from quizmaster.models import Attempt
+from quizmaster.metrics import Histogram
+from quizmaster.submissions import import_attempts
+
+# Write-behind queue for quiz submissions. A submit appends the graded attempt to a journal
+# in its own SQLite file and returns straight away; a flusher thread moves everything
+# journaled into the main database in group commits. Each entry carries a submission key that
+# becomes Attempt.submission_key, so an entry replayed after a crash (written to the database
+# but not yet removed from the journal) is skipped rather than recorded twice.
+
+
+class SubmissionJournal:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS pending_submission ('
+            ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' submission_key TEXT NOT NULL UNIQUE,'
+            ' payload TEXT NOT NULL,'
+            ' enqueued_at REAL NOT NULL)'
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # A submission is acknowledged once it's here, so every append is synced to disk
+            conn.execute('PRAGMA synchronous=FULL')
+            self._local.conn = conn
+        return conn
+
+    def append(self, key, payload):
+        self._connect().execute(
+            'INSERT INTO pending_submission (submission_key, payload, enqueued_at) VALUES (?, ?, ?)',
+            (key, json.dumps(payload), time.time())
+        )
+
+    def head(self, limit):
+        return self._connect().execute(
+            'SELECT seq, submission_key, payload, enqueued_at FROM pending_submission ORDER BY seq LIMIT ?', (limit,)
+        ).fetchall()
+
+    def remove(self, seqs):
+        conn = self._connect()
+        conn.execute('BEGIN')
+        conn.executemany('DELETE FROM pending_submission WHERE seq = ?', [(seq,) for seq in seqs])
+        conn.execute('COMMIT')
+
+    def depth(self):
+        return self._connect().execute('SELECT count(*) FROM pending_submission').fetchone()[0]
+
+
+def _record(key, payload):
+    return {
+        'submission_key': key,
+        'user_id': payload['user_id'],
+        'quiz_id': payload['quiz_id'],
+        'score': payload['score'],
+        'duration': payload['duration'],
+        'completed_at': datetime.fromisoformat(payload['completed_at']),
+        'answers': [tuple(answer) for answer in payload['answers']],
+    }
+
+
+def _unwritten(records):
+    # Entries replayed after a crash may already be in the database
+    keys = [record['submission_key'] for record in records]
+    done = set(db.session.execute(select(Attempt.submission_key).where(Attempt.submission_key.in_(keys))).scalars())
+    return [record for record in records if record['submission_key'] not in done]
+
+
+class SubmissionQueue:
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.journal = None
+        self.batch_size = 500
+        self.interval = 0.2
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.flushed = 0
+        self.flush_latency = Histogram('quizmaster_submission_flush_seconds',
+                                       'Time to write one batch of queued submissions to the database.')
+        self.queue_delay = Histogram('quizmaster_submission_queue_delay_seconds',
+                                     'Time from enqueue until the attempt is committed.',
+                                     buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+        self._metrics_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.setdefault('SUBMISSION_QUEUE_ENABLED', False)
+        app.config.setdefault('SUBMISSION_QUEUE_PATH', os.path.join(app.instance_path, 'submission_queue.db'))
+        self.batch_size = app.config.setdefault('SUBMISSION_FLUSH_BATCH', 500)
+        self.interval = app.config.setdefault('SUBMISSION_FLUSH_INTERVAL', 0.2)  # seconds
+        app.extensions['submission_queue'] = self
+        app.cli.add_command(flush_command)
+        if not self.enabled:
+            return
+        path = app.config['SUBMISSION_QUEUE_PATH']
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.journal = SubmissionJournal(path)
+        # Starting the flusher also recovers anything journaled before a restart
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._flush_forever, daemon=True, name='submission-flusher')
+            self._thread.start()
+        self._wakeup.set()
+
+    def enqueue(self, user_id, quiz_id, score, answers, duration=None):
+        # Returns the submission key once the entry is durable in the journal
+        key = secrets.token_hex(16)
+        self.journal.append(key, {
+            'user_id': user_id,
+            'quiz_id': quiz_id,
+            'score': score,
+            'duration': duration,
+            'completed_at': datetime.utcnow().isoformat(),
+            'answers': list(answers),
+        })
+        self._wakeup.set()
+        return key
+
+    def depth(self):
+        return self.journal.depth() if self.journal else 0
+
+    def flush(self):
+        # Writes every journaled submission to the database; returns how many were recorded.
+        # Needs an app context. The lock keeps the flusher thread and the CLI from overlapping.
+        recorded = 0
+        with self._flush_lock:
+            while True:
+                entries = self.journal.head(self.batch_size)
+                if not entries:
+                    return recorded
+                started = time.perf_counter()
+                written = self._write([_record(key, json.loads(payload)) for _, key, payload, _ in entries])
+                self.journal.remove([seq for seq, _, _, _ in entries])
+                finished = time.perf_counter()
+                now = time.time()
+                with self._metrics_lock:
+                    self.flush_latency.observe(finished - started)
+                    for _, _, _, enqueued_at in entries:
+                        self.queue_delay.observe(now - enqueued_at)
+                    self.flushed += written
+                recorded += written
+
+    def _write(self, records):
+        records = _unwritten(records)
+        if not records:
+            return 0
+        try:
+            return import_attempts(records, batch_size=len(records))
+        except IntegrityError:
+            db.session.rollback()
+        # One bad entry (its quiz or user deleted since the submit) mustn't block the rest:
+        # retry one at a time and drop whatever still fails
+        written = 0
+        for record in _unwritten(records):
+            try:
+                written += import_attempts([record])
+            except IntegrityError as exc:
+                db.session.rollback()
+                self.app.logger.error('Dropping queued submission %s: %s', record['submission_key'], exc.orig)
+        return written
+
+    def _flush_forever(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Flushing queued submissions failed; will retry')
+                finally:
+                    db.session.remove()
+
+    def render(self):
+        yield '# HELP quizmaster_submission_queue_depth Submissions journaled but not yet in the database.'
+        yield '# TYPE quizmaster_submission_queue_depth gauge'
+        yield f'quizmaster_submission_queue_depth {self.depth()}'
+        with self._metrics_lock:
+            yield '# HELP quizmaster_submissions_flushed_total Queued submissions written to the database.'
+            yield '# TYPE quizmaster_submissions_flushed_total counter'
+            yield f'quizmaster_submissions_flushed_total {self.flushed}'
+            yield from self.flush_latency.render()
+            yield from self.queue_delay.render()
+
+
+@click.command('submissions-flush')
+@with_appcontext
+def flush_command():
+    """Write any journaled quiz submissions to the database."""
+    queue = current_app.extensions['submission_queue']
+    if queue.journal is None:
+        raise click.ClickException('The submission queue is not enabled.')
+    click.echo(f'Recorded {queue.flush()} queued submissions.')
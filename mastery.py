@@ -0,0 +1,198 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import case, delete, func, insert, select
+from quizmaster.extensions import db
+from quizmaster.database import read_execute, upsert
+from quizmaster.archive import archive
+from quizmaster.models import Chapter, Quiz, Question, Attempt, ChapterMastery, SubjectMastery
+
+# Per-user rollups by chapter and by subject, so a dashboard reads one row per chapter instead
+# of joining every attempt up to its subject. Submissions add to them in their own transaction;
+# deletions that take attempts with them recompute the affected users' rows in that subject.
+# Archived attempts stay in.
+
+COLUMNS = ('attempts', 'best_percent', 'percent_sum', 'last_attempt_at')
+REBUILD_BATCH_SIZE = 5000
+REFRESH_USERS_BATCH_SIZE = 500
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_command)
+
+
+def backfill():
+    # Databases that predate the rollup tables get them filled once
+    if db.session.execute(select(ChapterMastery.user_id).limit(1)).first() is None \
+            and db.session.execute(select(Attempt.id).limit(1)).first() is not None:
+        rebuild()
+
+
+def _percent(score, questions):
+    return (score or 0) * 100.0 / questions if questions else 0.0
+
+
+def _upsert(model, key, row):
+    stmt = upsert(model).values(**key, **row)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={
+            'attempts': model.attempts + stmt.excluded.attempts,
+            'percent_sum': model.percent_sum + stmt.excluded.percent_sum,
+            'best_percent': case((stmt.excluded.best_percent > model.best_percent, stmt.excluded.best_percent),
+                                 else_=model.best_percent),
+            'last_attempt_at': case((model.last_attempt_at.is_(None), stmt.excluded.last_attempt_at),
+                                    (stmt.excluded.last_attempt_at > model.last_attempt_at,
+                                     stmt.excluded.last_attempt_at),
+                                    else_=model.last_attempt_at),
+        }
+    )
+    db.session.execute(stmt)
+
+
+def _accumulate(rollups, key, percent, completed_at):
+    row = rollups.get(key)
+    if row is None:
+        rollups[key] = {'attempts': 1, 'best_percent': percent, 'percent_sum': percent, 'last_attempt_at': completed_at}
+        return
+    row['attempts'] += 1
+    row['percent_sum'] += percent
+    row['best_percent'] = max(row['best_percent'], percent)
+    if completed_at and (row['last_attempt_at'] is None or completed_at > row['last_attempt_at']):
+        row['last_attempt_at'] = completed_at
+
+
+def record_attempts(entries):
+    # entries: iterable of (quiz_id, user_id, score, completed_at) for newly inserted attempts.
+    # Runs in the caller's transaction; one upsert per user x chapter and user x subject touched.
+    entries = list(entries)
+    if not entries:
+        return
+    question_count = select(func.count(Question.id)).where(Question.quiz_id == Quiz.id).scalar_subquery()
+    quizzes = {
+        quiz_id: (chapter_id, subject_id, questions)
+        for quiz_id, chapter_id, subject_id, questions in db.session.execute(
+            select(Quiz.id, Quiz.chapter_id, Chapter.subject_id, question_count)
+            .join(Chapter, Quiz.chapter_id == Chapter.id)
+            .where(Quiz.id.in_({entry[0] for entry in entries}))
+        )
+    }
+    chapters, subjects = {}, {}
+    for quiz_id, user_id, score, completed_at in entries:
+        chapter_id, subject_id, questions = quizzes[quiz_id]
+        percent = _percent(score, questions)
+        _accumulate(chapters, (user_id, chapter_id), percent, completed_at)
+        _accumulate(subjects, (user_id, subject_id), percent, completed_at)
+    # Sorted so concurrent submitters take row locks in the same order
+    for (user_id, chapter_id), row in sorted(chapters.items()):
+        _upsert(ChapterMastery, {'user_id': user_id, 'chapter_id': chapter_id}, row)
+    for (user_id, subject_id), row in sorted(subjects.items()):
+        _upsert(SubjectMastery, {'user_id': user_id, 'subject_id': subject_id}, row)
+
+
+def _rollup_query(group_column, subject_id, user_ids):
+    questions = select(Question.quiz_id, func.count(Question.id).label('questions')) \
+        .group_by(Question.quiz_id).subquery()
+    percent = case((questions.c.questions > 0, func.coalesce(Attempt.score, 0) * 100.0 / questions.c.questions),
+                   else_=0.0)
+    query = select(Attempt.user_id, group_column, func.count(Attempt.id), func.max(percent), func.sum(percent),
+                   func.max(Attempt.completed_at)) \
+        .join(Quiz, Attempt.quiz_id == Quiz.id) \
+        .join(Chapter, Quiz.chapter_id == Chapter.id) \
+        .outerjoin(questions, questions.c.quiz_id == Quiz.id) \
+        .group_by(Attempt.user_id, group_column)
+    if subject_id is not None:
+        query = query.where(Chapter.subject_id == subject_id)
+    if user_ids is not None:
+        query = query.where(Attempt.user_id.in_(user_ids))
+    return query
+
+
+def _recompute(subject_id=None, user_ids=None):
+    # Replaces the rollups of one subject (or all) and of some users (or all) in the caller's
+    # transaction; returns the number of rows the live attempts produced
+    chapter_rows = delete(ChapterMastery)
+    subject_rows = delete(SubjectMastery)
+    if subject_id is not None:
+        chapter_rows = chapter_rows.where(
+            ChapterMastery.chapter_id.in_(select(Chapter.id).where(Chapter.subject_id == subject_id)))
+        subject_rows = subject_rows.where(SubjectMastery.subject_id == subject_id)
+    if user_ids is not None:
+        chapter_rows = chapter_rows.where(ChapterMastery.user_id.in_(user_ids))
+        subject_rows = subject_rows.where(SubjectMastery.user_id.in_(user_ids))
+    db.session.execute(chapter_rows, execution_options={'synchronize_session': False})
+    db.session.execute(subject_rows, execution_options={'synchronize_session': False})
+    written = db.session.execute(insert(ChapterMastery).from_select(
+        ['user_id', 'chapter_id', *COLUMNS], _rollup_query(Quiz.chapter_id, subject_id, user_ids)
+    )).rowcount
+    written += db.session.execute(insert(SubjectMastery).from_select(
+        ['user_id', 'subject_id', *COLUMNS], _rollup_query(Chapter.subject_id, subject_id, user_ids)
+    )).rowcount
+    store = archive()
+    if store:
+        quiz_ids = select(Quiz.id).join(Chapter, Quiz.chapter_id == Chapter.id)
+        if subject_id is not None:
+            quiz_ids = quiz_ids.where(Chapter.subject_id == subject_id)
+        batch = []
+        for quiz_id, _, user_id, score, completed_at in store.scores(db.session.execute(quiz_ids).scalars().all(),
+                                                                     user_ids):
+            batch.append((quiz_id, user_id, score, completed_at))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                record_attempts(batch)
+                batch = []
+        record_attempts(batch)
+    return written
+
+
+def rebuild(subject_id=None):
+    # Recompute from the attempts table, for everything or for one subject and its chapters,
+    # with two INSERT ... SELECT statements, then fold in archived attempts; returns the number
+    # of rollup rows the live attempts produced. Percentages use each quiz's current question count, as the
+    # history page does.
+    written = _recompute(subject_id)
+    db.session.commit()
+    return written
+
+
+def refresh_users(subject_id, user_ids):
+    # For deletes that take attempts out of a subject: recompute only these users' rows in it,
+    # in the caller's transaction, a batch of users at a time
+    user_ids = sorted(set(user_ids))
+    for start in range(0, len(user_ids), REFRESH_USERS_BATCH_SIZE):
+        _recompute(subject_id, user_ids[start:start + REFRESH_USERS_BATCH_SIZE])
+
+
+def _summary(row):
+    return {
+        'attempts': row.attempts,
+        'best_percent': round(row.best_percent, 1),
+        'average_percent': round(row.percent_sum / row.attempts, 1) if row.attempts else None,
+        'last_attempt_at': row.last_attempt_at.isoformat() if row.last_attempt_at else None,
+    }
+
+
+def user_mastery(user_id, catalog):
+    # Subjects the user has attempted, each with its attempted chapters, in catalog order;
+    # names come from the cached catalog so only the user's own rollup rows are read
+    chapters = {row.chapter_id: row for row in read_execute(
+        select(ChapterMastery).where(ChapterMastery.user_id == user_id)).scalars()}
+    subjects = {row.subject_id: row for row in read_execute(
+        select(SubjectMastery).where(SubjectMastery.user_id == user_id)).scalars()}
+    result = []
+    for subject in catalog.subjects:
+        row = subjects.get(subject['id'])
+        if row is None:
+            continue
+        result.append(dict(_summary(row), subject_id=subject['id'], name=subject['name'], chapters=[
+            dict(_summary(chapters[chapter['id']]), chapter_id=chapter['id'], name=chapter['name'])
+            for chapter in catalog.chapters(subject['id']) if chapter['id'] in chapters
+        ]))
+    return {'user_id': user_id, 'subjects': result}
+
+
+@click.command('mastery-rebuild')
+@click.option('--subject-id', type=int, default=None)
+@with_appcontext
+def rebuild_command(subject_id):
+    """Recompute per-user chapter and subject mastery from the attempts table."""
+    written = rebuild(subject_id)
+    click.echo(f'Rebuilt {written} mastery rows.')
@@ -0,0 +1,169 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from quizmaster.extensions import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    # Prometheus-style histogram per label set; buckets are stored non-cumulative and summed on export
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series.setdefault(label_values, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket
+                yield f'{self.name}_bucket{_labels(self.labels + ("le",), label_values + (bound,))} {cumulative}'
+            yield f'{self.name}_sum{labels} {total:.6f}'
+            yield f'{self.name}_count{labels} {count}'
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._series = {}
+
+    def inc(self, *label_values, amount=1):
+        self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for label_values, value in sorted(self._series.items()):
+            yield f'{self.name}{_labels(self.labels, label_values)} {value}'
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Metrics:
+    # Per-request route/status/latency plus SQL statement count and time, aggregated into
+    # histograms for /metrics. With METRICS_ENABLED off and no SLOW_QUERY_MS nothing is hooked
+    # into Flask or SQLAlchemy at all.
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_seconds = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._gauges = {}
+        self._collectors = {}
+        self.requests = Counter('quizmaster_http_requests_total', 'Requests by route, method and status.',
+                                ('route', 'method', 'status'))
+        self.latency = Histogram('quizmaster_http_request_duration_seconds', 'Request wall time.',
+                                 LATENCY_BUCKETS, ('route', 'method'))
+        self.query_count = Histogram('quizmaster_http_request_queries', 'SQL statements issued per request.',
+                                     QUERY_COUNT_BUCKETS, ('route', 'method'))
+        self.query_time = Histogram('quizmaster_http_request_query_duration_seconds', 'Time spent in SQL per request.',
+                                    LATENCY_BUCKETS, ('route', 'method'))
+        self.slow_queries = Counter('quizmaster_sql_slow_queries_total', 'Statements slower than SLOW_QUERY_MS.',
+                                    ('route',))
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault('METRICS_ENABLED', False)
+        slow_query_ms = app.config.setdefault('SLOW_QUERY_MS', None)
+        self.slow_query_seconds = slow_query_ms / 1000 if slow_query_ms else None
+        self.logger = app.logger
+        if self.enabled:
+            app.before_request(self._before_request)
+            app.after_request(self._after_request)
+            app.teardown_request(self._teardown_request)
+        if self.enabled or self.slow_query_seconds:
+            with app.app_context():
+                engines = list(db.engines.values())
+            for engine in engines:
+                event.listen(engine, 'before_cursor_execute', self._before_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def gauge(self, name, help, read, kind='gauge'):
+        # Values read at scrape time from elsewhere in the app (cache sizes, queue depths)
+        self._gauges[name] = (help, read, kind)
+
+    def register(self, collector):
+        # Components that keep their own metrics expose them with render(), yielding text lines
+        self._collectors[id(collector)] = collector
+
+    def _before_request(self):
+        self._local.queries = 0
+        self._local.query_time = 0.0
+        g.metrics_started = time.perf_counter()
+
+    def _after_request(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _teardown_request(self, exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        status = g.pop('metrics_status', 500 if exc is not None else 200)
+        route, method = _route(), request.method
+        with self._lock:
+            self.requests.inc(route, method, status)
+            self.latency.observe(elapsed, route, method)
+            self.query_count.observe(getattr(self._local, 'queries', 0), route, method)
+            self.query_time.observe(getattr(self._local, 'query_time', 0.0), route, method)
+        self._local.queries = 0
+        self._local.query_time = 0.0
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['metrics_started'] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        self._local.queries = getattr(self._local, 'queries', 0) + 1
+        self._local.query_time = getattr(self._local, 'query_time', 0.0) + elapsed
+        if self.slow_query_seconds and elapsed >= self.slow_query_seconds:
+            route = _route() if has_request_context() else '-'
+            self.logger.warning('Slow query (%.1f ms) on %s: %s', elapsed * 1000, route, ' '.join(statement.split()))
+            with self._lock:
+                self.slow_queries.inc(route)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for metric in (self.requests, self.latency, self.query_count, self.query_time, self.slow_queries):
+                lines.extend(metric.render())
+        for name, (help, read, kind) in self._gauges.items():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {read()}')
+        for collector in self._collectors.values():
+            lines.extend(collector.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _route():
+    # The URL rule rather than the path, so /quiz/1 and /quiz/2 share one series
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
@@ -0,0 +1,298 @@
+import sys
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, func, inspect, select, text, update
+from sqlalchemy.schema import AddConstraint, CreateTable
+from quizmaster.extensions import db
+from quizmaster.archive import archive
+from quizmaster.models import (Attempt, AttemptAnswer, Chapter, ChapterMastery, Option, Question, Quiz, QuizScoreBucket,
+                               QuizStats, SiteStats, Subject, SubjectMastery, User)
+
+# Versioned, idempotent upgrades for databases created by older releases. db.create_all()
+# only creates missing tables, so new columns and indexes on existing tables land here.
+# Every step checks before it changes anything, which also makes them no-ops on fresh databases.
+
+_version_metadata = MetaData()
+schema_version = Table(
+    'schema_version', _version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _columns(connection, table):
+    return {column['name'] for column in inspect(connection).get_columns(table)}
+
+
+def _add_column(connection, model, name):
+    table = model.__table__
+    if name in _columns(connection, table.name):
+        return
+    column = table.c[name]
+    ddl = f'ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(connection.dialect)}'
+    if not column.nullable:
+        default = column.default.arg if column.default is not None else None
+        ddl += f' NOT NULL DEFAULT {default!r}'
+    connection.execute(text(ddl))
+
+
+def _create_indexes(connection, *models, names=None):
+    # names: only these indexes; a step must not create indexes on columns a later step adds
+    for model in models:
+        for index in model.__table__.indexes:
+            if names is None or index.name in names:
+                index.create(connection, checkfirst=True)
+
+
+def _v1_quiz_questions_version(connection):
+    _add_column(connection, Quiz, 'questions_version')
+
+
+def _v2_hot_path_indexes(connection):
+    _create_indexes(connection, Chapter, Quiz, Question, Option, Attempt, AttemptAnswer, names={
+        'ix_chapter_subject_id', 'ix_quiz_chapter_id', 'ix_question_quiz_id', 'ix_option_question_id',
+        'ix_attempt_user_completed', 'ix_attempt_quiz_score', 'ix_attempt_answer_attempt_id',
+    })
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text('ANALYZE'))
+
+
+def _v3_widen_password_hash(connection):
+    # scrypt hashes run past 128 characters; SQLite ignores VARCHAR lengths anyway
+    if connection.dialect.name != 'sqlite':
+        column_type = User.__table__.c.password_hash.type.compile(connection.dialect)
+        connection.execute(text(f'ALTER TABLE "user" ALTER COLUMN password_hash TYPE {column_type}'))
+
+
+def _v4_catalog_version(connection):
+    if inspect(connection).has_table(SiteStats.__tablename__):
+        _add_column(connection, SiteStats, 'catalog_version')
+
+
+def _v5_updated_at(connection):
+    for model in (Subject, Chapter, Quiz, Question):
+        _add_column(connection, model, 'updated_at')
+        connection.execute(text(
+            f'UPDATE {model.__tablename__} SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL'
+        ))
+
+
+# Tables whose foreign keys carry ON DELETE actions, parents before children
+CASCADE_MODELS = (Chapter, Quiz, Question, Option, Attempt, AttemptAnswer, QuizStats, QuizScoreBucket)
+
+
+def _v7_packed_answers(connection):
+    _add_column(connection, Attempt, 'packed_answers')
+
+
+def _v8_submission_key(connection):
+    _add_column(connection, Attempt, 'submission_key')
+    _create_indexes(connection, Attempt, names={'ix_attempt_submission_key'})
+
+
+def _v9_attempt_autoincrement(connection):
+    # Without AUTOINCREMENT SQLite hands the highest id out again once that attempt is archived;
+    # other databases use sequences, which never go back
+    if connection.dialect.name != 'sqlite':
+        return
+    ddl = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'attempt'")).scalar()
+    if 'AUTOINCREMENT' not in ddl.upper():
+        _rebuild_sqlite_table(connection, Attempt)
+    store = archive()
+    highest = max(connection.execute(select(func.max(Attempt.id))).scalar() or 0, store.max_id() if store else 0)
+    connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'attempt'"))
+    connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('attempt', :seq)"), {'seq': highest})
+
+
+def _v10_foreign_key_indexes(connection):
+    # Every ON DELETE action looks up the child rows by the referencing column
+    _create_indexes(connection, Question, AttemptAnswer, ChapterMastery, SubjectMastery, names={
+        'ix_question_correct_option_id', 'ix_attempt_answer_question_id', 'ix_attempt_answer_selected_option_id',
+        'ix_chapter_mastery_chapter_id', 'ix_subject_mastery_subject_id',
+    })
+
+
+def _v11_catalog_changed_at(connection):
+    if inspect(connection).has_table(SiteStats.__tablename__):
+        _add_column(connection, SiteStats, 'catalog_changed_at')
+        connection.execute(text('UPDATE site_stats SET catalog_changed_at = CURRENT_TIMESTAMP WHERE catalog_changed_at IS NULL'))
+
+
+def _foreign_keys_match(connection, table):
+    existing = {
+        (tuple(fk['constrained_columns']), ((fk.get('options') or {}).get('ondelete') or '').upper())
+        for fk in inspect(connection).get_foreign_keys(table.name)
+    }
+    wanted = {(tuple(column.name for column in fk.columns), (fk.ondelete or '').upper()) for fk in table.foreign_key_constraints}
+    return existing == wanted
+
+
+def _remove_orphans(connection, table):
+    # Rows left pointing at deleted parents by the old ORM-only cascades; do what the new
+    # constraint would have done so the rebuilt table passes the foreign key check
+    for fk in table.foreign_keys:
+        orphaned = fk.parent.isnot(None) & fk.parent.not_in(select(fk.column))
+        if fk.ondelete == 'SET NULL':
+            connection.execute(update(table).where(orphaned).values({fk.parent.name: None}))
+        else:
+            connection.execute(delete(table).where(orphaned))
+
+
+def _rebuild_sqlite_table(connection, model):
+    # SQLite can't alter constraints: copy the rows into a table created from the current
+    # model, drop the old one and rename the copy into place
+    table = model.__table__
+    preparer = connection.dialect.identifier_preparer
+    name = preparer.format_table(table)
+    copy = f'_rebuild_{table.name}'
+    ddl = str(CreateTable(table).compile(connection)).strip()
+    connection.execute(text(f'DROP TABLE IF EXISTS {copy}'))
+    connection.execute(text(ddl.replace(f'CREATE TABLE {name} (', f'CREATE TABLE {copy} (', 1)))
+    existing = _columns(connection, table.name)
+    columns = ', '.join(preparer.quote(column.name) for column in table.c if column.name in existing)
+    connection.execute(text(f'INSERT INTO {copy} ({columns}) SELECT {columns} FROM {name}'))
+    connection.execute(text(f'DROP TABLE {name}'))
+    connection.execute(text(f'ALTER TABLE {copy} RENAME TO {name}'))
+    _create_indexes(connection, model)
+
+
+def _replace_foreign_keys(connection, model):
+    table = model.__table__
+    preparer = connection.dialect.identifier_preparer
+    for fk in inspect(connection).get_foreign_keys(table.name):
+        connection.execute(text(f'ALTER TABLE {preparer.format_table(table)} DROP CONSTRAINT {preparer.quote(fk["name"])}'))
+    for constraint in table.foreign_key_constraints:
+        connection.execute(AddConstraint(constraint))
+
+
+def _v6_cascading_foreign_keys(connection):
+    for model in CASCADE_MODELS:
+        if _foreign_keys_match(connection, model.__table__):
+            continue
+        _remove_orphans(connection, model.__table__)
+        if connection.dialect.name == 'sqlite':
+            _rebuild_sqlite_table(connection, model)
+        else:
+            _replace_foreign_keys(connection, model)
+    if connection.dialect.name == 'sqlite':
+        violations = connection.execute(text('PRAGMA foreign_key_check')).fetchall()
+        if violations:
+            raise RuntimeError(f'Foreign key violations after rebuilding tables: {violations[:10]}')
+
+
+MIGRATIONS = [
+    (1, 'quiz.questions_version', _v1_quiz_questions_version),
+    (2, 'indexes on hot foreign keys, attempt history and quiz scores', _v2_hot_path_indexes),
+    (3, 'user.password_hash widened to 256 characters', _v3_widen_password_hash),
+    (4, 'site_stats.catalog_version', _v4_catalog_version),
+    (5, 'updated_at on subject, chapter, quiz and question', _v5_updated_at),
+    (6, 'ON DELETE CASCADE / SET NULL foreign keys', _v6_cascading_foreign_keys),
+    (7, 'attempt.packed_answers', _v7_packed_answers),
+    (8, 'attempt.submission_key, unique', _v8_submission_key),
+    (9, 'attempt ids never reused', _v9_attempt_autoincrement),
+    (10, 'indexes on foreign keys with ON DELETE actions', _v10_foreign_key_indexes),
+    (11, 'site_stats.catalog_changed_at', _v11_catalog_changed_at),
+]
+
+
+def current_version(connection):
+    schema_version.create(connection, checkfirst=True)
+    return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def upgrade(target=None):
+    # Applies pending migrations, each in its own transaction; returns the versions applied
+    applied = []
+    with db.engine.begin() as connection:
+        version = current_version(connection)
+    for number, description, migrate in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        with db.engine.connect() as connection:
+            sqlite = connection.dialect.name == 'sqlite'
+            if sqlite:
+                # Table rebuilds drop tables that other rows reference. SQLite ignores this
+                # pragma inside a transaction, so it's switched off before beginning one.
+                connection.execute(text('PRAGMA foreign_keys = OFF'))
+                connection.commit()
+            try:
+                with connection.begin():
+                    migrate(connection)
+                    connection.execute(schema_version.insert().values(
+                        version=number, description=description, applied_at=datetime.utcnow()
+                    ))
+            finally:
+                if sqlite:
+                    connection.execute(text('PRAGMA foreign_keys = ON'))
+                    connection.commit()
+        applied.append(number)
+    return applied
+
+
+# Hot queries and the index each one must use; checked against EXPLAIN QUERY PLAN so a
+# dropped or unusable index shows up as a failure rather than a slow page.
+def _hot_queries():
+    from quizmaster.history import history_query
+    compiled = history_query(1).compile(db.engine, compile_kwargs={'literal_binds': True})
+    return [
+        ('dashboard history', str(compiled), 'ix_attempt_user_completed'),
+        ('quiz leaderboard', 'SELECT id, score FROM attempt WHERE quiz_id = 1 ORDER BY score DESC LIMIT 10', 'ix_attempt_quiz_score'),
+        ('quiz questions', 'SELECT id FROM question WHERE quiz_id = 1', 'ix_question_quiz_id'),
+        ('question options', 'SELECT id FROM option WHERE question_id = 1', 'ix_option_question_id'),
+        ('attempt answers', 'SELECT id FROM attempt_answer WHERE attempt_id = 1', 'ix_attempt_answer_attempt_id'),
+        ('subject chapters', 'SELECT id FROM chapter WHERE subject_id = 1', 'ix_chapter_subject_id'),
+        ('chapter quizzes', 'SELECT id FROM quiz WHERE chapter_id = 1', 'ix_quiz_chapter_id'),
+        # Lookups the ON DELETE actions make for each deleted question, option, chapter and subject
+        ('answers of a question', 'SELECT id FROM attempt_answer WHERE question_id = 1', 'ix_attempt_answer_question_id'),
+        ('answers of an option', 'SELECT id FROM attempt_answer WHERE selected_option_id = 1',
+         'ix_attempt_answer_selected_option_id'),
+        ('questions with a correct option', 'SELECT id FROM question WHERE correct_option_id = 1',
+         'ix_question_correct_option_id'),
+        ('chapter mastery', 'SELECT user_id FROM chapter_mastery WHERE chapter_id = 1', 'ix_chapter_mastery_chapter_id'),
+        ('subject mastery', 'SELECT user_id FROM subject_mastery WHERE subject_id = 1', 'ix_subject_mastery_subject_id'),
+    ]
+
+
+def check_query_plans():
+    # Returns a list of (name, expected index, plan) for every query that misses its index
+    if db.engine.dialect.name != 'sqlite':
+        return []
+    failures = []
+    for name, sql, index in _hot_queries():
+        plan = [row[-1] for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+        uses_index = any(index in step for step in plan)
+        sorts = any('USE TEMP B-TREE FOR ORDER BY' in step for step in plan)
+        if not uses_index or sorts:
+            failures.append((name, index, plan))
+    return failures
+
+
+@click.command('db-upgrade')
+@click.option('--target', type=int, default=None, help='Stop after this schema version.')
+@with_appcontext
+def upgrade_command(target):
+    """Apply pending schema migrations to the configured database."""
+    applied = upgrade(target)
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(map(str, applied))}")
+    else:
+        click.echo('Database schema is up to date.')
+
+
+@click.command('db-check-plans')
+@with_appcontext
+def check_plans_command():
+    """Fail if a hot query's plan does not use its index."""
+    failures = check_query_plans()
+    for name, index, plan in failures:
+        click.echo(f'FAIL {name}: expected {index}, got {plan}')
+    if failures:
+        sys.exit(1)
+    click.echo('All hot queries use their indexes.')
+
+
+def init_app(app):
+    app.cli.add_command(upgrade_command)
+    app.cli.add_command(check_plans_command)
@@ -1,72 +1,162 @@
-from quizmaster.extensions import db
+from quizmaster.extensions import db, passwords, user_cache
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(256), nullable=False)
     full_name = db.Column(db.String(120), nullable=False)
     qualification = db.Column(db.String(120))
     dob = db.Column(db.Date)
     is_admin = db.Column(db.Boolean, default=False)
-    attempts = db.relationship('Attempt', backref='user', lazy=True)
+    attempts = db.relationship('Attempt', backref='user', lazy=True, passive_deletes=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return passwords.needs_rehash(self.password_hash)
+
+user_cache.listen(User)
 
 class Subject(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text)
-    chapters = db.relationship('Chapter', backref='subject', lazy=True, cascade='all, delete-orphan')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Child rows are removed by ON DELETE CASCADE in the database, so deletes never load them
+    chapters = db.relationship('Chapter', backref='subject', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
 
 class Chapter(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete='CASCADE'), nullable=False, index=True)
     name = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text)
-    quizzes = db.relationship('Quiz', backref='chapter', lazy=True, cascade='all, delete-orphan')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    quizzes = db.relationship('Quiz', backref='chapter', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
 
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id', ondelete='CASCADE'), nullable=False, index=True)
     title = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text)
     date_of_quiz = db.Column(db.Date)
     time_duration = db.Column(db.String(8))  # hh:mm
     remarks = db.Column(db.Text)
     difficulty = db.Column(db.String(32))
-    questions = db.relationship('Question', backref='quiz', lazy=True, cascade='all, delete-orphan')
-    attempts = db.relationship('Attempt', backref='quiz', lazy=True)
+    questions_version = db.Column(db.Integer, nullable=False, default=0)  # bumped on question changes
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    questions = db.relationship('Question', backref='quiz', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    attempts = db.relationship('Attempt', backref='quiz', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    stats = db.relationship('QuizStats', uselist=False, lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    score_buckets = db.relationship('QuizScoreBucket', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+
+    @property
+    def duration_seconds(self):
+        # time_duration is stored as "hh:mm"
+        try:
+            hours, minutes = (self.time_duration or '').split(':')
+            return int(hours) * 3600 + int(minutes) * 60
+        except ValueError:
+            return None
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), nullable=False, index=True)
     text = db.Column(db.Text, nullable=False)
-    options = db.relationship('Option', backref='question', lazy=True, cascade='all, delete-orphan')
-    correct_option_id = db.Column(db.Integer, db.ForeignKey('option.id'))
+    options = db.relationship('Option', backref='question', lazy=True, cascade='all, delete-orphan', passive_deletes=True, foreign_keys='Option.question_id')
+    correct_option_id = db.Column(db.Integer, db.ForeignKey('option.id', use_alter=True, ondelete='SET NULL'), index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Option(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', ondelete='CASCADE'), nullable=False, index=True)
     text = db.Column(db.String(256), nullable=False)
 
 class Attempt(db.Model):
+    __table_args__ = (
+        db.Index('ix_attempt_user_completed', 'user_id', 'completed_at'),
+        db.Index('ix_attempt_quiz_score', 'quiz_id', 'score'),
+        # Ids of archived attempts must never be handed out again
+        {'sqlite_autoincrement': True},
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), nullable=False)
     score = db.Column(db.Integer)
     completed_at = db.Column(db.DateTime, default=datetime.utcnow)
     duration = db.Column(db.Integer)  # in seconds
-    answers = db.relationship('AttemptAnswer', backref='attempt', lazy=True, cascade='all, delete-orphan')
+    # Answers packed by quizmaster.answers when ANSWER_STORAGE is "packed"; NULL means AttemptAnswer rows
+    packed_answers = db.deferred(db.Column(db.LargeBinary))
+    # Set by the submission queue so a journaled submission is written at most once
+    submission_key = db.Column(db.String(64), unique=True, index=True)
+    answers = db.relationship('AttemptAnswer', backref='attempt', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
 
 class AttemptAnswer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    attempt_id = db.Column(db.Integer, db.ForeignKey('attempt.id'), nullable=False)
-    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
-    selected_option_id = db.Column(db.Integer, db.ForeignKey('option.id')) 
\ No newline at end of file
+    attempt_id = db.Column(db.Integer, db.ForeignKey('attempt.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Indexed so the database's ON DELETE actions don't scan every answer per deleted row
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', ondelete='CASCADE'), nullable=False, index=True)
+    selected_option_id = db.Column(db.Integer, db.ForeignKey('option.id', ondelete='SET NULL'), index=True)
+
+class SiteStats(db.Model):
+    # Single row (id=1) of counters kept in step by quizmaster.stats, plus the catalog version
+    id = db.Column(db.Integer, primary_key=True)
+    users = db.Column(db.Integer, nullable=False, default=0)
+    subjects = db.Column(db.Integer, nullable=False, default=0)
+    chapters = db.Column(db.Integer, nullable=False, default=0)
+    quizzes = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime)
+    catalog_version = db.Column(db.Integer, nullable=False, default=0)  # bumped on subject/chapter/quiz writes
+    catalog_changed_at = db.Column(db.DateTime, default=datetime.utcnow)  # set with each bump, deletes included
+
+class QuizStats(db.Model):
+    # Running per-quiz aggregates maintained by quizmaster.analytics
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    score_sq_sum = db.Column(db.Integer, nullable=False, default=0)
+    leaderboard = db.Column(db.Text, nullable=False, default='[]')  # JSON, best first
+    updated_at = db.Column(db.DateTime)
+
+class QuizScoreBucket(db.Model):
+    # Score histogram: number of attempts of a quiz that scored exactly `score`
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class ChapterMastery(db.Model):
+    # Per user x chapter rollup of attempts, maintained by quizmaster.mastery. Percentages are
+    # score over the quiz's question count, so quizzes of different lengths weigh the same.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id', ondelete='CASCADE'), primary_key=True, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    best_percent = db.Column(db.Float, nullable=False, default=0)
+    percent_sum = db.Column(db.Float, nullable=False, default=0)
+    last_attempt_at = db.Column(db.DateTime)
+
+class SubjectMastery(db.Model):
+    # Same rollup per user x subject
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete='CASCADE'), primary_key=True, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    best_percent = db.Column(db.Float, nullable=False, default=0)
+    percent_sum = db.Column(db.Float, nullable=False, default=0)
+    last_attempt_at = db.Column(db.DateTime)
+
+class DeletionJob(db.Model):
+    # Progress of a subject/chapter/quiz deletion run by quizmaster.deletion
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(16), nullable=False)  # subject, chapter or quiz
+    target_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending, running, done, failed
+    total = db.Column(db.Integer, nullable=False, default=0)  # attempts to delete
+    deleted = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
\ No newline at end of file
@@ -0,0 +1,75 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class PasswordServiceBusy(Exception):
+    pass
+
+
+def canonical_method(method):
+    # werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1"); filling them in
+    # here saves hashing a throwaway password, a full scrypt run, on every worker's startup
+    name, *params = method.split(':')
+    defaults = {'scrypt': ['32768', '8', '1'], 'pbkdf2': ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)]}.get(name)
+    if defaults is None:
+        return method
+    return ':'.join([name, *params, *defaults[len(params):]])
+
+
+class PasswordService:
+    # Hashing runs on a small bounded pool: hashlib's scrypt/pbkdf2 release the GIL, so
+    # the pool uses real cores, and the in-flight cap keeps a login storm from queueing
+    # without limit behind the CPU while other requests wait.
+    def __init__(self):
+        self.method = 'scrypt'
+        self.salt_length = 16
+        self.timeout = None
+        self._canonical_method = None
+        self._executor = None
+        self._slots = None
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_SALT_LENGTH', 16)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1))
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 64)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.salt_length = app.config['PASSWORD_SALT_LENGTH']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._canonical_method = canonical_method(self.method)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=app.config['PASSWORD_HASH_WORKERS'],
+                                            thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_WORKERS'] + app.config['PASSWORD_HASH_MAX_PENDING'])
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        slots = self._slots
+        if not slots.acquire(timeout=self.timeout):
+            raise PasswordServiceBusy('Too many password operations in flight')
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        # The slot is held until the hash finishes, not just until this caller stops waiting
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordServiceBusy('Password operation timed out') from None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        method = password_hash.split('$', 1)[0]
+        return method != (self._canonical_method or self.method)
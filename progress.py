@@ -0,0 +1,136 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+# In-progress quiz state lives server side; the cookie only carries an opaque token.
+
+
+class MemoryProgressBackend:
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, state = entry
+            if expires_at < time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return json.loads(state)
+
+    def set(self, token, state):
+        with self._lock:
+            self._entries[token] = (time.time() + self.ttl, json.dumps(state))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+
+class SQLiteProgressBackend:
+    # Kept in its own file so progress writes never wait on the main database's writer lock
+    purge_every = 500
+
+    def __init__(self, path, ttl, max_entries):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS quiz_progress ('
+            ' token TEXT PRIMARY KEY,'
+            ' state TEXT NOT NULL,'
+            ' expires_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_quiz_progress_expires_at ON quiz_progress (expires_at)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, token):
+        row = self._connect().execute(
+            'SELECT state FROM quiz_progress WHERE token = ? AND expires_at >= ?',
+            (token, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, token, state):
+        conn = self._connect()
+        conn.execute(
+            'INSERT INTO quiz_progress (token, state, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(token) DO UPDATE SET state = excluded.state, expires_at = excluded.expires_at',
+            (token, json.dumps(state), time.time() + self.ttl)
+        )
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge()
+
+    def delete(self, token):
+        self._connect().execute('DELETE FROM quiz_progress WHERE token = ?', (token,))
+
+    def purge(self):
+        # Drop expired rows, then the least recently touched ones beyond max_entries
+        conn = self._connect()
+        conn.execute('DELETE FROM quiz_progress WHERE expires_at < ?', (time.time(),))
+        conn.execute(
+            'DELETE FROM quiz_progress WHERE token IN ('
+            ' SELECT token FROM quiz_progress ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+
+class ProgressStore:
+    def init_app(self, app):
+        app.config.setdefault('QUIZ_PROGRESS_BACKEND', 'sqlite')
+        app.config.setdefault('QUIZ_PROGRESS_TTL', 6 * 60 * 60)
+        app.config.setdefault('QUIZ_PROGRESS_MAX_ENTRIES', 100000)
+        app.config.setdefault('QUIZ_PROGRESS_PATH', os.path.join(app.instance_path, 'quiz_progress.db'))
+        ttl = app.config['QUIZ_PROGRESS_TTL']
+        max_entries = app.config['QUIZ_PROGRESS_MAX_ENTRIES']
+        if app.config['QUIZ_PROGRESS_BACKEND'] == 'memory':
+            backend = MemoryProgressBackend(ttl, max_entries)
+        elif app.config['QUIZ_PROGRESS_BACKEND'] == 'sqlite':
+            os.makedirs(os.path.dirname(app.config['QUIZ_PROGRESS_PATH']) or '.', exist_ok=True)
+            backend = SQLiteProgressBackend(app.config['QUIZ_PROGRESS_PATH'], ttl, max_entries)
+        else:
+            raise ValueError(f"Unknown QUIZ_PROGRESS_BACKEND: {app.config['QUIZ_PROGRESS_BACKEND']}")
+        app.extensions['progress_store'] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions['progress_store']
+
+    def new_token(self):
+        return secrets.token_urlsafe(24)
+
+    def get(self, token):
+        return self.backend.get(token) if token else None
+
+    def save(self, token, state):
+        self.backend.set(token, state)
+
+    def discard(self, token):
+        if token:
+            self.backend.delete(token)
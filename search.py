@@ -0,0 +1,177 @@
+import re
+import click
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import column, delete, event, table as table_clause, text
+from quizmaster.extensions import db
+from quizmaster.models import User, Subject, Chapter, Quiz, Question
+
+SEARCH_PAGE_SIZE = 20
+
+# kind -> (model, table, title column, body expression)
+INDEXED_KINDS = {
+    'user': (User, '"user"', 'email', 'full_name'),
+    'subject': (Subject, 'subject', 'name', 'description'),
+    'chapter': (Chapter, 'chapter', 'name', 'description'),
+    'quiz': (Quiz, 'quiz', 'title', "coalesce(description, '') || ' ' || coalesce(remarks, '')"),
+    'question': (Question, 'question', 'text', "''"),
+}
+KIND_BY_MODEL = {model: kind for kind, (model, *_) in INDEXED_KINDS.items()}
+
+_search_index = table_clause('search_index', column('kind'), column('ref_id'))
+
+# Title matches weigh more than body matches; kind and ref_id are unindexed
+RANK = 'bm25(search_index, 0.0, 0.0, 10.0, 1.0)'
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_command)
+
+
+def create_index():
+    # FTS5 is only used on SQLite builds that ship it; everything else falls back to LIKE
+    enabled = False
+    if db.engine.dialect.name == 'sqlite':
+        try:
+            existed = db.session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+            )).first() is not None
+            db.session.execute(text(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS search_index '
+                "USING fts5(kind UNINDEXED, ref_id UNINDEXED, title, body, tokenize='unicode61')"
+            ))
+            db.session.commit()
+            enabled = True
+        except Exception:
+            db.session.rollback()
+        else:
+            # Databases that predate the index get it filled once, or searches would find nothing
+            if not existed:
+                rebuild()
+    current_app.extensions['search_index'] = enabled
+    return enabled
+
+
+def fts_enabled():
+    if not has_app_context():
+        return False
+    enabled = current_app.extensions.get('search_index')
+    if enabled is None:
+        # Apps started without init-db find out on first use; a separate connection, as this
+        # also runs from mapper events in the middle of a flush
+        enabled = False
+        if db.engine.dialect.name == 'sqlite':
+            with db.engine.connect() as connection:
+                enabled = connection.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+                )).first() is not None
+        current_app.extensions['search_index'] = enabled
+    return enabled
+
+
+def _document(obj):
+    if isinstance(obj, User):
+        return obj.email, obj.full_name or ''
+    if isinstance(obj, Quiz):
+        return obj.title, f'{obj.description or ""} {obj.remarks or ""}'
+    if isinstance(obj, Question):
+        return obj.text, ''
+    return obj.name, obj.description or ''
+
+
+def _on_write(mapper, connection, target):
+    if not fts_enabled():
+        return
+    kind = KIND_BY_MODEL[mapper.class_]
+    title, body = _document(target)
+    connection.execute(text('DELETE FROM search_index WHERE kind = :kind AND ref_id = :ref_id'),
+                       {'kind': kind, 'ref_id': target.id})
+    connection.execute(text('INSERT INTO search_index (kind, ref_id, title, body) VALUES (:kind, :ref_id, :title, :body)'),
+                       {'kind': kind, 'ref_id': target.id, 'title': title, 'body': body})
+
+
+def _on_delete(mapper, connection, target):
+    if not fts_enabled():
+        return
+    connection.execute(text('DELETE FROM search_index WHERE kind = :kind AND ref_id = :ref_id'),
+                       {'kind': KIND_BY_MODEL[mapper.class_], 'ref_id': target.id})
+
+
+# Index rows are written on the flush connection, so they commit or roll back with the CRUD change
+for _model in KIND_BY_MODEL:
+    event.listen(_model, 'after_insert', _on_write)
+    event.listen(_model, 'after_update', _on_write)
+    event.listen(_model, 'after_delete', _on_delete)
+
+
+def index_rows(kind, ids):
+    # For bulk paths that insert with Core statements and bypass the mapper events
+    if not fts_enabled() or not ids:
+        return
+    _, table, title, body = INDEXED_KINDS[kind]
+    params = {f'id{i}': ref_id for i, ref_id in enumerate(ids)}
+    placeholders = ', '.join(f':{name}' for name in params)
+    db.session.execute(text(f'DELETE FROM search_index WHERE kind = :kind AND ref_id IN ({placeholders})'),
+                       {'kind': kind, **params})
+    db.session.execute(text(
+        f'INSERT INTO search_index (kind, ref_id, title, body) '
+        f'SELECT :kind, id, {title}, {body} FROM {table} WHERE id IN ({placeholders})'
+    ), {'kind': kind, **params})
+
+
+def remove_rows(kind, ids):
+    # For set-based deletes, where the database cascades and no mapper events fire; ids may
+    # be a list or a SELECT of ids, so run it before the rows it selects are deleted
+    if not fts_enabled():
+        return
+    db.session.execute(delete(_search_index).where(_search_index.c.kind == kind, _search_index.c.ref_id.in_(ids)))
+
+
+def rebuild():
+    db.session.execute(text('DELETE FROM search_index'))
+    for kind, (_, table, title, body) in INDEXED_KINDS.items():
+        db.session.execute(text(
+            f'INSERT INTO search_index (kind, ref_id, title, body) SELECT :kind, id, {title}, {body} FROM {table}'
+        ), {'kind': kind})
+    db.session.execute(text("INSERT INTO search_index (search_index) VALUES ('optimize')"))
+    db.session.commit()
+
+
+def _match_expression(query):
+    # Quote every term so user input can't inject FTS syntax; the last term is a prefix match
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search(kind, query, page=1, per_page=SEARCH_PAGE_SIZE):
+    # Returns (results, has_next); results are ranked when FTS5 is available
+    model = INDEXED_KINDS[kind][0]
+    offset = (max(page, 1) - 1) * per_page
+    if not fts_enabled():
+        column = getattr(model, INDEXED_KINDS[kind][2])
+        rows = model.query.filter(column.ilike(f'%{query}%')).order_by(model.id) \
+            .offset(offset).limit(per_page + 1).all()
+        return rows[:per_page], len(rows) > per_page
+    match = _match_expression(query)
+    if match is None:
+        return [], False
+    ids = db.session.execute(text(
+        f'SELECT ref_id FROM search_index WHERE search_index MATCH :match AND kind = :kind '
+        f'ORDER BY {RANK} LIMIT :limit OFFSET :offset'
+    ), {'match': match, 'kind': kind, 'limit': per_page + 1, 'offset': offset}).scalars().all()
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    by_id = {obj.id: obj for obj in model.query.filter(model.id.in_(ids)).all()} if ids else {}
+    return [by_id[ref_id] for ref_id in ids if ref_id in by_id], has_next
+
+
+@click.command('search-rebuild')
+@with_appcontext
+def rebuild_command():
+    """Rebuild the full-text search index from the current tables."""
+    rebuild()
+    click.echo('Search index rebuilt.')
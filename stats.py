@@ -0,0 +1,115 @@
+import threading
+import time
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, select, update
+from quizmaster.extensions import db
+from quizmaster.database import read_execute
+from quizmaster.archive import archive
+from quizmaster.models import User, Subject, Chapter, Quiz, Attempt, SiteStats
+
+STATS_ID = 1
+COUNTERS = ('users', 'subjects', 'chapters', 'quizzes', 'attempts')
+COUNTER_BY_MODEL = {User: 'users', Subject: 'subjects', Chapter: 'chapters', Quiz: 'quizzes', Attempt: 'attempts'}
+
+
+def init_app(app):
+    app.config.setdefault('STATS_RECONCILE_INTERVAL', 0)
+    app.cli.add_command(reconcile_command)
+    interval = app.config['STATS_RECONCILE_INTERVAL']
+    if interval:
+        thread = threading.Thread(target=_reconcile_forever, args=(app, interval), daemon=True, name='stats-reconcile')
+        thread.start()
+
+
+def ensure_row():
+    # adjust() has nothing to update until the counters row exists
+    if db.session.get(SiteStats, STATS_ID) is None:
+        reconcile()
+
+
+def _counts():
+    return {
+        'users': User.query.filter_by(is_admin=False).count(),
+        'subjects': Subject.query.count(),
+        'chapters': Chapter.query.count(),
+        'quizzes': Quiz.query.count(),
+        # Archived attempts still count; they've only moved out of the live table
+        'attempts': Attempt.query.count() + _archived_count()
+    }
+
+
+def _archived_count():
+    store = archive()
+    return store.count() if store else 0
+
+
+def reconcile():
+    # Recount everything and overwrite the counters, fixing any drift
+    counts = _counts()
+    row = db.session.get(SiteStats, STATS_ID)
+    if row is None:
+        row = SiteStats(id=STATS_ID)
+        db.session.add(row)
+    for name, value in counts.items():
+        setattr(row, name, value)
+    row.reconciled_at = datetime.utcnow()
+    db.session.commit()
+    return counts
+
+
+def _reconcile_forever(app, interval):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                reconcile()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Stats reconciliation failed')
+
+
+def read():
+    row = read_execute(select(SiteStats).where(SiteStats.id == STATS_ID)).scalar()
+    if row is None:
+        return reconcile()
+    return {name: getattr(row, name) for name in COUNTERS}
+
+
+def adjust(connection=None, **deltas):
+    # Bumps counters inside the caller's transaction; used by bulk paths that skip mapper events
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    stmt = update(SiteStats).where(SiteStats.id == STATS_ID).values(
+        **{name: getattr(SiteStats, name) + delta for name, delta in deltas.items()}
+    )
+    (connection or db.session).execute(stmt)
+
+
+def _counted(target):
+    return not isinstance(target, User) or not target.is_admin
+
+
+def _on_insert(mapper, connection, target):
+    if _counted(target):
+        adjust(connection, **{COUNTER_BY_MODEL[mapper.class_]: 1})
+
+
+def _on_delete(mapper, connection, target):
+    if _counted(target):
+        adjust(connection, **{COUNTER_BY_MODEL[mapper.class_]: -1})
+
+
+for _model in COUNTER_BY_MODEL:
+    event.listen(_model, 'after_insert', _on_insert)
+    event.listen(_model, 'after_delete', _on_delete)
+
+
+@click.command('stats-reconcile')
+@with_appcontext
+def reconcile_command():
+    """Recount the admin dashboard counters from the base tables."""
+    counts = reconcile()
+    click.echo(', '.join(f'{name}={value}' for name, value in counts.items()))
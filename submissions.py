@@ -0,0 +1,75 @@
+from datetime import datetime
+from sqlalchemy import insert
+from quizmaster.extensions import db
+from quizmaster.models import Attempt
+from quizmaster import analytics, answers as stored_answers, mastery, stats
+
+IMPORT_BATCH_SIZE = 1000
+
+
+def record_attempt(user_id, quiz_id, score, answers, duration=None, completed_at=None, commit=True,
+                   submission_key=None):
+    # answers is a list of (question_id, selected_option_id) pairs; the attempt and
+    # all of its answers go out in one transaction, the answers as a single executemany
+    # or, with packed storage, in the attempt row itself
+    packed = stored_answers.storage() == 'packed'
+    attempt = Attempt(
+        user_id=user_id,
+        quiz_id=quiz_id,
+        score=score,
+        completed_at=completed_at or datetime.utcnow(),
+        duration=duration,
+        packed_answers=stored_answers.pack(answers) if packed else None,
+        submission_key=submission_key
+    )
+    db.session.add(attempt)
+    db.session.flush()
+    if not packed:
+        stored_answers.insert_answers([attempt.id], [answers])
+    analytics.record_scores([(quiz_id, attempt.id, user_id, score, attempt.completed_at)])
+    mastery.record_attempts([(quiz_id, user_id, score, attempt.completed_at)])
+    if commit:
+        db.session.commit()
+    return attempt
+
+
+def import_attempts(records, batch_size=IMPORT_BATCH_SIZE):
+    # records yields dicts shaped like record_attempt's arguments; each batch of
+    # attempts is inserted with RETURNING and committed together with its answers
+    imported = 0
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            imported += _import_batch(batch)
+            batch = []
+    if batch:
+        imported += _import_batch(batch)
+    return imported
+
+
+def _import_batch(batch):
+    packed = stored_answers.storage() == 'packed'
+    attempt_rows = [{
+        'user_id': record['user_id'],
+        'quiz_id': record['quiz_id'],
+        'score': record['score'],
+        'completed_at': record.get('completed_at') or datetime.utcnow(),
+        'duration': record.get('duration'),
+        'packed_answers': stored_answers.pack(record['answers']) if packed else None,
+        'submission_key': record.get('submission_key')
+    } for record in batch]
+    attempt_ids = db.session.scalars(
+        insert(Attempt).returning(Attempt.id, sort_by_parameter_order=True),
+        attempt_rows
+    ).all()
+    if not packed:
+        stored_answers.insert_answers(attempt_ids, [record['answers'] for record in batch])
+    stats.adjust(attempts=len(attempt_ids))
+    analytics.record_scores(
+        (row['quiz_id'], attempt_id, row['user_id'], row['score'], row['completed_at'])
+        for attempt_id, row in zip(attempt_ids, attempt_rows)
+    )
+    mastery.record_attempts((row['quiz_id'], row['user_id'], row['score'], row['completed_at']) for row in attempt_rows)
+    db.session.commit()
+    return len(attempt_ids)
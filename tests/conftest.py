@@ -0,0 +1,114 @@
+import importlib.util
+import os
+import sqlite3
+import sys
+import types
+import pytest
+
+# The modules import each other as quizmaster.*; when the checkout isn't itself on the path
+# under that name, register it as the quizmaster package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if importlib.util.find_spec('quizmaster') is None:
+    package = types.ModuleType('quizmaster')
+    package.__path__ = [ROOT]
+    sys.modules['quizmaster'] = package
+
+
+# Schema as created by the first release, before any migration existed
+BASELINE_SCHEMA = '''
+CREATE TABLE user (id INTEGER NOT NULL, email VARCHAR(120) NOT NULL, password_hash VARCHAR(128) NOT NULL,
+    full_name VARCHAR(120) NOT NULL, qualification VARCHAR(120), dob DATE, is_admin BOOLEAN,
+    PRIMARY KEY (id), UNIQUE (email));
+CREATE TABLE subject (id INTEGER NOT NULL, name VARCHAR(120) NOT NULL, description TEXT, PRIMARY KEY (id));
+CREATE TABLE question (id INTEGER NOT NULL, quiz_id INTEGER NOT NULL, text TEXT NOT NULL, correct_option_id INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(quiz_id) REFERENCES quiz (id), FOREIGN KEY(correct_option_id) REFERENCES option (id));
+CREATE TABLE option (id INTEGER NOT NULL, question_id INTEGER NOT NULL, text VARCHAR(256) NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(question_id) REFERENCES question (id));
+CREATE TABLE chapter (id INTEGER NOT NULL, subject_id INTEGER NOT NULL, name VARCHAR(120) NOT NULL, description TEXT,
+    PRIMARY KEY (id), FOREIGN KEY(subject_id) REFERENCES subject (id));
+CREATE TABLE quiz (id INTEGER NOT NULL, chapter_id INTEGER NOT NULL, title VARCHAR(120) NOT NULL, description TEXT,
+    date_of_quiz DATE, time_duration VARCHAR(8), remarks TEXT, difficulty VARCHAR(32),
+    PRIMARY KEY (id), FOREIGN KEY(chapter_id) REFERENCES chapter (id));
+CREATE TABLE attempt (id INTEGER NOT NULL, user_id INTEGER NOT NULL, quiz_id INTEGER NOT NULL, score INTEGER,
+    completed_at DATETIME, duration INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id), FOREIGN KEY(quiz_id) REFERENCES quiz (id));
+CREATE TABLE attempt_answer (id INTEGER NOT NULL, attempt_id INTEGER NOT NULL, question_id INTEGER NOT NULL,
+    selected_option_id INTEGER, PRIMARY KEY (id), FOREIGN KEY(attempt_id) REFERENCES attempt (id),
+    FOREIGN KEY(question_id) REFERENCES question (id), FOREIGN KEY(selected_option_id) REFERENCES option (id));
+INSERT INTO user VALUES (1, 'admin@quiz.com', 'x', 'Admin', NULL, NULL, 1), (2, 's@x.com', 'x', 'Stu', NULL, NULL, 0);
+INSERT INTO subject VALUES (1, 'Physics', 'Motion and velocity');
+INSERT INTO chapter VALUES (1, 1, 'Kinematics', NULL);
+INSERT INTO quiz VALUES (1, 1, 'Velocity basics', NULL, NULL, '00:10', NULL, NULL);
+INSERT INTO question VALUES (1, 1, 'What is velocity?', 2);
+INSERT INTO option VALUES (1, 1, 'Mass'), (2, 1, 'Speed with direction');
+INSERT INTO attempt VALUES (1, 2, 1, 1, '2024-01-01 10:00:00.000000', 60);
+INSERT INTO attempt_answer VALUES (1, 1, 1, 2);
+'''
+
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    from quizmaster.app import create_app
+
+    def make_app(**config):
+        return create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'quizmaster.db'}",
+            'QUIZ_PROGRESS_BACKEND': 'memory',
+            'ARCHIVE_PATH': str(tmp_path / 'attempt_archive.db'),
+            'SUBMISSION_QUEUE_PATH': str(tmp_path / 'submission_queue.db'),
+            # Cheap hashes; the seeded admin account doesn't need scrypt here
+            'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+            'WTF_CSRF_ENABLED': False,
+            **config,
+        })
+    return make_app
+
+
+@pytest.fixture
+def admin_client(make_app):
+    # A test client logged in as the seeded admin account
+    client = make_app().test_client()
+    client.post('/login', data={'email': 'admin@quiz.com', 'password': 'admin123'})
+    # No template renders the login flash, and pending flashes turn conditional GETs off
+    with client.session_transaction() as session:
+        session.pop('_flashes', None)
+    return client
+
+
+@pytest.fixture
+def make_quiz():
+    # A quiz with one two-option question, the second option correct; needs an app context
+    from quizmaster.extensions import db
+    from quizmaster.models import Chapter, Option, Question, Quiz, Subject
+
+    def make_quiz(title='Velocity basics', time_duration='00:10'):
+        subject = Subject(name='Physics')
+        db.session.add(subject)
+        db.session.flush()
+        chapter = Chapter(subject_id=subject.id, name='Kinematics')
+        db.session.add(chapter)
+        db.session.flush()
+        quiz = Quiz(chapter_id=chapter.id, title=title, time_duration=time_duration)
+        db.session.add(quiz)
+        db.session.flush()
+        question = Question(quiz_id=quiz.id, text='What is velocity?')
+        db.session.add(question)
+        db.session.flush()
+        options = [Option(question_id=question.id, text=text) for text in ('Mass', 'Speed with direction')]
+        db.session.add_all(options)
+        db.session.flush()
+        question.correct_option_id = options[1].id
+        db.session.commit()
+        return quiz
+    return make_quiz
+
+
+@pytest.fixture
+def baseline_app(make_app, tmp_path):
+    # An app over a database created by the first release, upgraded by create_app()
+    connection = sqlite3.connect(tmp_path / 'quizmaster.db')
+    connection.executescript(BASELINE_SCHEMA)
+    connection.close()
+    return make_app()
@@ -0,0 +1,58 @@
+from datetime import datetime
+import pytest
+from quizmaster.extensions import db
+from quizmaster.archive import archive, archive_attempts
+from quizmaster.models import Attempt, Chapter, Quiz, Subject, User
+
+
+def make_attempts(*completed):
+    subject = Subject(name='Physics')
+    db.session.add(subject)
+    db.session.flush()
+    chapter = Chapter(subject_id=subject.id, name='Kinematics')
+    db.session.add(chapter)
+    db.session.flush()
+    quiz = Quiz(chapter_id=chapter.id, title='Velocity basics', time_duration='00:10')
+    user = User(email='s@x.com', full_name='Stu', password_hash='x')
+    db.session.add_all([quiz, user])
+    db.session.flush()
+    attempts = [Attempt(user_id=user.id, quiz_id=quiz.id, score=1, completed_at=when) for when in completed]
+    db.session.add_all(attempts)
+    db.session.commit()
+    return attempts
+
+
+def test_archived_ids_are_not_reused(make_app):
+    app = make_app()
+    with app.app_context():
+        old = make_attempts(datetime(2020, 1, 1))[0]
+        old_id, user_id, quiz_id = old.id, old.user_id, old.quiz_id
+        assert archive_attempts(datetime(2021, 1, 1)) == 1
+        new = Attempt(user_id=user_id, quiz_id=quiz_id, score=2, completed_at=datetime.utcnow())
+        db.session.add(new)
+        db.session.commit()
+        assert new.id > old_id
+
+
+def test_rerun_stops_at_a_different_attempt_with_an_archived_id(make_app):
+    app = make_app()
+    with app.app_context():
+        old = make_attempts(datetime(2020, 1, 1))[0]
+        old_id, user_id, quiz_id = old.id, old.user_id, old.quiz_id
+        archive_attempts(datetime(2021, 1, 1))
+        # As a database from before ids were kept unique could have handed the id out again
+        db.session.add(Attempt(id=old_id, user_id=user_id, quiz_id=quiz_id, score=2, completed_at=datetime(2020, 6, 1)))
+        db.session.commit()
+        with pytest.raises(RuntimeError):
+            archive_attempts(datetime(2021, 1, 1))
+        db.session.rollback()
+        assert db.session.get(Attempt, old_id).score == 2
+
+
+def test_each_app_reads_its_own_archive(make_app, tmp_path):
+    with make_app().app_context():
+        make_attempts(datetime(2020, 1, 1))
+        archive_attempts(datetime(2021, 1, 1))
+        assert archive().count() == 1
+    with make_app(ARCHIVE_PATH=str(tmp_path / 'other_archive.db')).app_context():
+        assert archive().count() == 0
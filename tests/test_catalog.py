@@ -0,0 +1,33 @@
+from datetime import datetime
+from sqlalchemy import update
+from quizmaster.extensions import db
+from quizmaster.catalog import current_version
+from quizmaster.deletion import delete_target
+from quizmaster.models import Quiz, SiteStats
+
+
+def test_question_changes_leave_the_catalog_alone(make_app, make_quiz):
+    with make_app().app_context():
+        quiz = make_quiz()
+        version = current_version()
+        quiz.questions_version = Quiz.questions_version + 1
+        db.session.commit()
+        assert current_version() == version
+        quiz.title = 'Velocity revisited'
+        db.session.commit()
+        assert current_version() == version + 1
+
+
+def test_delete_moves_last_modified_forward(admin_client, make_quiz):
+    with admin_client.application.app_context():
+        quiz_id = make_quiz().id
+        make_quiz(title='Acceleration')
+        db.session.execute(update(SiteStats).values(catalog_changed_at=datetime(2024, 1, 1)))
+        db.session.commit()
+    last_modified = admin_client.get('/api/catalog').headers['Last-Modified']
+    with admin_client.application.app_context():
+        delete_target('quiz', quiz_id)
+    response = admin_client.get('/api/catalog', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+    assert quiz_id not in [quiz['id'] for subject in response.get_json()['subjects']
+                           for chapter in subject['chapters'] for quiz in chapter['quizzes']]
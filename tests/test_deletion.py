@@ -0,0 +1,105 @@
+import time
+from datetime import datetime
+import pytest
+from quizmaster.extensions import db
+from quizmaster.archive import archive_attempts
+from quizmaster.deletion import delete_target
+from quizmaster.models import Attempt, Chapter, ChapterMastery, Quiz, Subject, SubjectMastery, User
+from quizmaster import mastery, stats
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        users = [User(email=email, full_name='Stu', password_hash='x') for email in ('s@x.com', 't@x.com')]
+        db.session.add_all(users)
+        for name in ('Physics', 'Maths'):
+            subject = Subject(name=name)
+            db.session.add(subject)
+            db.session.flush()
+            for chapter_name in ('One', 'Two'):
+                chapter = Chapter(subject_id=subject.id, name=chapter_name)
+                db.session.add(chapter)
+                db.session.flush()
+                for number in (1, 2):
+                    quiz = Quiz(chapter_id=chapter.id, title=f'{name} {chapter_name} {number}', time_duration='00:10')
+                    db.session.add(quiz)
+                    db.session.flush()
+                    # The second user only takes the first quiz of each chapter
+                    db.session.add_all([
+                        Attempt(user_id=user.id, quiz_id=quiz.id, score=index + number, completed_at=when)
+                        for index, user in enumerate(users[:3 - number])
+                        for when in (datetime(2020, 1, number), datetime.utcnow())
+                    ])
+        db.session.commit()
+        archive_attempts(datetime(2021, 1, 1))
+        mastery.rebuild()
+    return app
+
+
+TARGETS = [('subject', 'Physics'), ('chapter', 'One'), ('quiz', 'Maths Two 1'), ('quiz', 'Maths Two 2')]
+
+
+def find_target(kind, target):
+    model, column = {'subject': (Subject, Subject.name), 'chapter': (Chapter, Chapter.name),
+                     'quiz': (Quiz, Quiz.title)}[kind]
+    return db.session.execute(db.select(model.id).where(column == target).limit(1)).scalar()
+
+
+@pytest.mark.parametrize('kind, target', TARGETS)
+def test_counters_match_a_recount_after_delete(app, kind, target):
+    with app.app_context():
+        delete_target(kind, find_target(kind, target))
+        counters = stats.read()
+        assert counters == stats.reconcile()
+        assert counters['attempts'] < 24
+
+
+def rollups():
+    return sorted((row.user_id, row.chapter_id, row.attempts, row.best_percent, row.percent_sum, row.last_attempt_at)
+                  for row in ChapterMastery.query), \
+        sorted((row.user_id, row.subject_id, row.attempts, row.best_percent, row.percent_sum, row.last_attempt_at)
+               for row in SubjectMastery.query)
+
+
+@pytest.mark.parametrize('kind, target', TARGETS)
+def test_mastery_matches_a_rebuild_after_delete(app, kind, target):
+    with app.app_context():
+        before = rollups()
+        delete_target(kind, find_target(kind, target))
+        after = rollups()
+        assert after != before
+        mastery.rebuild()
+        assert rollups() == after
+
+
+def test_background_delete_links_to_its_progress(make_app, make_quiz):
+    client = make_app(DELETE_INLINE_LIMIT=-1).test_client()
+    client.post('/login', data={'email': 'admin@quiz.com', 'password': 'admin123'})
+    with client.application.app_context():
+        quiz_id = make_quiz().id
+    client.get(f'/admin/quizzes/delete/{quiz_id}')
+    with client.session_transaction() as session:
+        message = session['_flashes'][-1][1]
+    url = message.rsplit(' ', 1)[-1]
+    assert url.startswith('/admin/deletions/')
+    assert client.get(url).get_json()['kind'] == 'quiz'
+    # Let the background job finish before the next test replaces the app it runs under
+    deadline = time.monotonic() + 10
+    while client.get(url).get_json()['status'] not in ('done', 'failed') and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert client.get(url).get_json()['status'] == 'done'
+
+
+def test_failed_rollup_refresh_keeps_the_quiz(app, monkeypatch):
+    def fail(*args):
+        raise RuntimeError('rollups unavailable')
+    monkeypatch.setattr(mastery, 'refresh_users', fail)
+    monkeypatch.setattr(mastery, 'rebuild', fail)
+    with app.app_context():
+        quiz_id = find_target('quiz', 'Maths Two 1')
+        with pytest.raises(RuntimeError):
+            delete_target('quiz', quiz_id)
+        db.session.rollback()
+        assert db.session.get(Quiz, quiz_id) is not None
@@ -0,0 +1,20 @@
+def test_payload_follows_quiz_edits(admin_client, make_quiz):
+    with admin_client.application.app_context():
+        quiz = make_quiz()
+        quiz_id, chapter_id = quiz.id, quiz.chapter_id
+    before = admin_client.get(f'/api/quizzes/{quiz_id}')
+    assert before.get_json()['quiz']['duration_seconds'] == 600
+    admin_client.post(f'/admin/chapters/{chapter_id}/quizzes/edit/{quiz_id}',
+                      data={'title': 'Velocity revisited', 'time_duration': '00:20', 'difficulty': 'Easy'})
+    after = admin_client.get(f'/api/quizzes/{quiz_id}')
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert (after.get_json()['quiz']['title'], after.get_json()['quiz']['duration_seconds']) == ('Velocity revisited', 1200)
+
+
+def test_null_answer_counts_as_unanswered(admin_client, make_quiz):
+    with admin_client.application.app_context():
+        quiz_id = make_quiz().id
+    question = admin_client.get(f'/api/quizzes/{quiz_id}').get_json()['questions'][0]
+    response = admin_client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {str(question['id']): None}})
+    assert response.status_code == 200
+    assert response.get_json()['score'] == 0
@@ -0,0 +1,37 @@
+import pytest
+from quizmaster.extensions import db
+from quizmaster.deletion import delete_target
+from quizmaster.models import Question, Quiz
+
+
+def submit_correct_answers(client, quiz_id):
+    questions = client.get(f'/api/quizzes/{quiz_id}').get_json()['questions']
+    return client.post(f'/api/quizzes/{quiz_id}/submit',
+                       json={'answers': {str(question['id']): question['options'][1]['id'] for question in questions}})
+
+
+def delete_in_another_worker(quiz_id):
+    # Leaves this process's caches alone, as a delete served by another worker would
+    db.session.delete(db.session.get(Quiz, quiz_id))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('delete', [lambda quiz_id: delete_target('quiz', quiz_id), delete_in_another_worker],
+                         ids=['delete_target', 'other_worker'])
+def test_quiz_that_reuses_a_deleted_id_gets_its_own_key(admin_client, make_quiz, delete):
+    with admin_client.application.app_context():
+        other_id = make_quiz(title='Kinematics').id
+        old_id = make_quiz().id
+    assert submit_correct_answers(admin_client, old_id).get_json()['score'] == 1
+    with admin_client.application.app_context():
+        delete(old_id)
+        # Takes the deleted question's id, so the new quiz's questions get new ones
+        db.session.add(Question(quiz_id=other_id, text='What is displacement?'))
+        db.session.commit()
+        quiz = make_quiz(title='Acceleration')
+        assert quiz.id == old_id
+        question_id = db.session.execute(db.select(Question.id).where(Question.quiz_id == quiz.id)).scalar()
+    response = submit_correct_answers(admin_client, old_id)
+    assert response.status_code == 200
+    assert response.get_json()['score'] == 1
+    assert [question['id'] for question in admin_client.get(f'/api/quizzes/{old_id}').get_json()['questions']] == [question_id]
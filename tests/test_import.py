@@ -0,0 +1,18 @@
+import io
+
+
+def test_import_is_an_upload_endpoint(admin_client):
+    assert admin_client.get('/admin/import').status_code == 405
+    response = admin_client.post('/admin/import', data={})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'No file uploaded.'}
+    response = admin_client.post('/admin/import', data={'file': (io.BytesIO(b''), 'questions.txt'), 'format': 'txt'})
+    assert response.status_code == 400
+
+
+def test_uploaded_csv_is_imported(admin_client):
+    csv = (b'subject,chapter,quiz,question,option_1,option_2,correct\n'
+           b'Physics,Kinematics,Velocity basics,What is velocity?,Mass,Speed with direction,2\n')
+    response = admin_client.post('/admin/import', data={'file': (io.BytesIO(csv), 'questions.csv')})
+    assert response.status_code == 200
+    assert (response.get_json()['imported'], response.get_json()['failed']) == (1, 0)
@@ -0,0 +1,36 @@
+import threading
+import pytest
+from flask import Flask
+from quizmaster.passwords import PasswordService, PasswordServiceBusy
+
+
+def make_service(**config):
+    app = Flask(__name__)
+    app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=0, PASSWORD_HASH_TIMEOUT=0.1, **config)
+    service = PasswordService()
+    service.init_app(app)
+    return service
+
+
+def test_timeout_is_reported_as_busy():
+    service = make_service()
+    release = threading.Event()
+    try:
+        with pytest.raises(PasswordServiceBusy):
+            service._run(release.wait)
+    finally:
+        release.set()
+
+
+def test_slot_is_held_until_the_hash_finishes():
+    service = make_service()
+    release = threading.Event()
+    try:
+        with pytest.raises(PasswordServiceBusy):
+            service._run(release.wait)
+        # The first hash is still running on the only worker, so there's no slot for another
+        with pytest.raises(PasswordServiceBusy):
+            service._run(lambda: True)
+    finally:
+        release.set()
+    assert service._run(lambda: True) is True
@@ -0,0 +1,25 @@
+from sqlalchemy import text
+from quizmaster.extensions import db
+from quizmaster.migrations import MIGRATIONS, check_query_plans, current_version
+
+
+def test_hot_queries_use_their_indexes(make_app):
+    app = make_app()
+    with app.app_context():
+        assert check_query_plans() == []
+
+
+def test_missing_index_is_reported(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.execute(text('DROP INDEX ix_attempt_user_completed'))
+        db.session.commit()
+        assert [name for name, _, _ in check_query_plans()] == ['dashboard history']
+
+
+def test_baseline_database_upgrades(baseline_app):
+    with baseline_app.app_context():
+        with db.engine.connect() as connection:
+            assert current_version(connection) == MIGRATIONS[-1][0]
+        assert check_query_plans() == []
+        assert db.session.execute(text('SELECT count(*) FROM attempt_answer')).scalar() == 1
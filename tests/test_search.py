@@ -0,0 +1,8 @@
+from quizmaster.search import search
+
+
+def test_baseline_database_is_searchable(baseline_app):
+    # The search index is created on upgrade and filled from the existing rows
+    with baseline_app.app_context():
+        results, _ = search('quiz', 'velocity')
+        assert [quiz.title for quiz in results] == ['Velocity basics']
@@ -0,0 +1,10 @@
+from quizmaster.extensions import db
+from quizmaster.analytics import quiz_summary
+from quizmaster.models import Quiz
+
+
+def test_baseline_database_gets_quiz_statistics(baseline_app):
+    # Quiz statistics are backfilled from the attempts already there
+    with baseline_app.app_context():
+        summary = quiz_summary(db.session.get(Quiz, 1))
+        assert (summary['attempts'], summary['mean']) == (1, 1.0)
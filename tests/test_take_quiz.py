@@ -0,0 +1,24 @@
+from quizmaster.extensions import db
+from quizmaster.models import Attempt, Option, Question
+
+
+def test_option_of_another_question_is_rejected(admin_client, make_quiz):
+    with admin_client.application.app_context():
+        quiz_id = make_quiz().id
+        other_question = db.session.execute(db.select(Question.id).where(Question.quiz_id == make_quiz().id)).scalar()
+        foreign_option = db.session.execute(db.select(Option.id).where(Option.question_id == other_question)).scalar()
+    for option_id in (foreign_option, 99999, 'x'):
+        response = admin_client.post(f'/quiz/{quiz_id}', data={'selected_option': option_id, 'action': 'submit'})
+        assert response.status_code == 400
+    with admin_client.application.app_context():
+        assert db.session.execute(db.select(Attempt.id)).first() is None
+
+
+def test_option_of_the_question_is_graded(admin_client, make_quiz):
+    with admin_client.application.app_context():
+        quiz = make_quiz()
+        quiz_id, correct = quiz.id, quiz.questions[0].correct_option_id
+    response = admin_client.post(f'/quiz/{quiz_id}', data={'selected_option': correct, 'action': 'submit'})
+    assert response.status_code == 302
+    with admin_client.application.app_context():
+        assert [attempt.score for attempt in Attempt.query.all()] == [1]
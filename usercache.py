@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from sqlalchemy import event
+
+SNAPSHOT_FIELDS = ('id', 'email', 'full_name', 'qualification', 'dob', 'is_admin')
+
+
+class CachedUser(UserMixin):
+    # Detached, read-only copy of the columns requests need from current_user. Code that
+    # needs the ORM row (password checks, relationships) loads User explicitly.
+    def __init__(self, user):
+        for field in SNAPSHOT_FIELDS:
+            setattr(self, field, getattr(user, field))
+
+    def __repr__(self):
+        return f'<CachedUser {self.id}>'
+
+
+class UserCache:
+    def __init__(self):
+        self.ttl = 60
+        self.max_entries = 10000
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.setdefault('USER_CACHE_TTL', 60)
+        self.max_entries = app.config.setdefault('USER_CACHE_MAX_ENTRIES', 10000)
+        self.clear()
+
+    def get(self, user_id, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        user = loader(user_id)
+        if user is None:
+            return None
+        snapshot = CachedUser(user)
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, snapshot)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def listen(self, model):
+        # Drop a user's snapshot as soon as their row changes in this process; other
+        # workers pick the change up when their entry's TTL runs out
+        def invalidate(mapper, connection, target):
+            self.invalidate(target.id)
+        event.listen(model, 'after_update', invalidate)
+        event.listen(model, 'after_delete', invalidate)